@@ -0,0 +1,55 @@
+import logging
+import time
+import asyncio
+
+
+class AdminRoster:
+    """Kanal adminlari ro'yxati - get_chat_administrators natijasi TTL bilan keshlanadi
+
+    Birinchi tekshiruv ro'yxatni yuklab kutadi. TTL o'tgach eski ro'yxat bilan
+    javob beriladi va yangilash fonda boshlanadi. invalidate() dan keyin
+    keyingi tekshiruv yangi ro'yxatni kutadi.
+    """
+
+    def __init__(self, chat_id, ttl=300):
+        self.chat_id = chat_id
+        self.ttl = ttl
+        self._admins = None
+        self._fetched_at = 0.0
+        self._refresh_task = None
+
+    def invalidate(self):
+        """Keshni bekor qilish (admin sozlamalari o'zgarganda)"""
+        self._admins = None
+
+    async def contains(self, bot, user_id):
+        """Foydalanuvchi kanal admini ekanligini xotiradan tekshirish"""
+        if self._admins is None:
+            await self._refresh(bot)
+        elif time.monotonic() - self._fetched_at > self.ttl:
+            self._refresh_in_background(bot)
+        return user_id in self._admins
+
+    def _refresh(self, bot):
+        # Bir vaqtda bir nechta so'rov bo'lsa ham faqat bitta API chaqiruvi
+        if self._refresh_task is None or self._refresh_task.done():
+            self._refresh_task = asyncio.create_task(self._fetch(bot))
+        return asyncio.shield(self._refresh_task)
+
+    def _refresh_in_background(self, bot):
+        task = self._refresh(bot)
+        task.add_done_callback(self._log_background_error)
+
+    @staticmethod
+    def _log_background_error(task):
+        if not task.cancelled() and task.exception() is not None:
+            logging.warning(f"⚠️ Kanal adminlarini yangilashda xato (eski ro'yxat ishlatiladi): {task.exception()}")
+
+    async def _fetch(self, bot):
+        admins = await bot.get_chat_administrators(self.chat_id)
+        self._admins = frozenset(
+            admin.user.id for admin in admins
+            if admin.status in ["administrator", "creator"]
+        )
+        self._fetched_at = time.monotonic()
+        logging.info(f"👥 Kanal adminlari yangilandi: {len(self._admins)} ta")
@@ -3,7 +3,7 @@ from aiogram import Bot, Dispatcher
 from aiogram.client.default import DefaultBotProperties
 from aiogram.enums import ParseMode
 from config import BOT_TOKEN
-from handlers import router, start_auto_delete_checker
+from handlers import router, start_auto_delete_checker, mapping_store
 
 async def main():
     bot = Bot(
@@ -13,6 +13,9 @@ async def main():
     dp = Dispatcher()
     dp.include_router(router)
 
+    # Mapping ni xotiraga yuklash (snapshot + journal)
+    await mapping_store.load()
+
     # Auto-delete checker ni boshlash
     await start_auto_delete_checker(bot)
     
@@ -36,10 +39,15 @@ async def main():
     print("  /add_keyword <model> <kalit_soz>")
     print("  /add_region_keyword <viloyat> <kalit_soz>")
     print("  /list_models, /list_regions, /list_keywords")
-    print("💾 Mapping fayl hajmi avtomatik kichik ushlab turiladi")
+    print("  /routes - Routing jadvali")
+    print("💾 Mapping xotirada, o'zgarishlar journal faylga yoziladi")
     print("🎯 Model + Viloyat ikki turdagi detection tizimi")
     
-    await dp.start_polling(bot)
+    try:
+        await dp.start_polling(bot)
+    finally:
+        # Oxirgi snapshot - keyingi ishga tushish tez bo'lishi uchun
+        await mapping_store.close()
 
 if __name__ == "__main__":
-    asyncio.run(main())
\ No newline at end of file
+    asyncio.run(main())
\ No newline at end of file
@@ -67,6 +67,52 @@ CHANNEL_NAMES = {
     get_channel_id("GENERAL_CHANNEL_2"): "Umumiy kanal 2",
 }
 
+# Raqamli sozlama olish funksiyasi
+def get_int_setting(env_name, default):
+    try:
+        return int(os.getenv(env_name, default))
+    except ValueError:
+        print(f"⚠️ {env_name} noto'g'ri format, {default} qo'yildi")
+        return default
+
+# Kasr sozlama olish funksiyasi
+def get_float_setting(env_name, default):
+    try:
+        return float(os.getenv(env_name, default))
+    except ValueError:
+        print(f"⚠️ {env_name} noto'g'ri format, {default} qo'yildi")
+        return default
+
+# Mapping saqlash sozlamalari
+MAPPING_BACKEND = os.getenv("MAPPING_BACKEND", "json").lower()  # json, partitioned, sqlite yoki binary
+MAPPING_DB_FILE = os.getenv("MAPPING_DB_FILE", "mapping.db")
+MAPPING_PARTITION_DIR = os.getenv("MAPPING_PARTITION_DIR", "mapping.d")  # partitioned: kunlik fayllar papkasi
+MAPPING_BINARY_FILE = os.getenv("MAPPING_BINARY_FILE", "mapping.bin")  # binary: mmap qilinadigan snapshot
+MAPPING_SNAPSHOT_EVERY = get_int_setting("MAPPING_SNAPSHOT_EVERY", 1000)  # shuncha journal yozuvidan keyin snapshot
+MAPPING_DURABILITY = os.getenv("MAPPING_DURABILITY", "batched").lower()  # memory, batched yoki fsync
+MAPPING_COMMIT_WINDOW = get_float_setting("MAPPING_COMMIT_WINDOW", 0.05)  # shu oraliqdagi o'zgarishlar bitta yozishda (sekund)
+
+# Tarqatish sozlamalari
+FANOUT_CONCURRENCY = get_int_setting("FANOUT_CONCURRENCY", 8)  # bir vaqtda nechta kanalga yuborish
+
+# Albom qismlarini yig'ish uchun kutish vaqti (sekund)
+MEDIA_GROUP_WAIT = get_float_setting("MEDIA_GROUP_WAIT", 1.0)
+
+# Ketma-ket editlarni birlashtirish oynasi (sekund)
+EDIT_DEBOUNCE = get_float_setting("EDIT_DEBOUNCE", 1.5)
+
+# Telegram rate limit (so'rov/sekund)
+RATE_LIMIT_GLOBAL = get_float_setting("RATE_LIMIT_GLOBAL", 30)      # butun bot uchun
+RATE_LIMIT_PER_CHAT = get_float_setting("RATE_LIMIT_PER_CHAT", 1)   # bitta kanal uchun
+RATE_LIMIT_CHAT_BURST = get_int_setting("RATE_LIMIT_CHAT_BURST", 3) # bitta kanalga ketma-ket ruxsat
+
+# Qayta urinish (429 / tarmoq xatolari)
+RETRY_MAX_ATTEMPTS = get_int_setting("RETRY_MAX_ATTEMPTS", 5)
+RETRY_BASE_DELAY = get_float_setting("RETRY_BASE_DELAY", 2)  # sekund, har urinishda 2 barobar
+
+# Kanal adminlari keshi (sekund)
+ADMIN_CACHE_TTL = get_int_setting("ADMIN_CACHE_TTL", 300)
+
 # Debug va versiya
 BOT_VERSION = "2.0.0"
 DEBUG = os.getenv("DEBUG", "false").lower() == "true"
@@ -1,11 +1,16 @@
+import contextlib
+import copy
+import hashlib
 import json
 import logging
 import asyncio
 import time
 import os
 from aiogram import Router, F
+from functools import partial
 from aiogram.types import (
-    Message, InlineKeyboardMarkup, InlineKeyboardButton, CallbackQuery
+    Message, InlineKeyboardMarkup, InlineKeyboardButton, CallbackQuery,
+    InputMediaPhoto, InputMediaVideo, InputMediaDocument
 )
 from aiogram.filters import Command, CommandStart
 
@@ -16,12 +21,39 @@ from config import (
     ALWAYS_SEND_TO, 
     CHANNEL_NAMES,
     BOT_OWNER_ID,  # config.py dan import - hard-code emas!
-    BOT_VERSION
+    BOT_VERSION,
+    MAPPING_SNAPSHOT_EVERY,
+    MAPPING_BACKEND,
+    MAPPING_DB_FILE,
+    MAPPING_PARTITION_DIR,
+    MAPPING_BINARY_FILE,
+    MAPPING_COMMIT_WINDOW,
+    MAPPING_DURABILITY,
+    FANOUT_CONCURRENCY,
+    RATE_LIMIT_GLOBAL,
+    RATE_LIMIT_PER_CHAT,
+    RATE_LIMIT_CHAT_BURST,
+    RETRY_MAX_ATTEMPTS,
+    RETRY_BASE_DELAY,
+    ADMIN_CACHE_TTL,
+    MEDIA_GROUP_WAIT,
+    EDIT_DEBOUNCE
 )
+from mapping_store import create_mapping_store, MappingRecord, MAPPING_FILE
+from sender import fan_out, RateLimiter, RetryScheduler
+from keyword_matcher import KeywordMatcher
+from admin_roster import AdminRoster
+from routing import RoutingTable
+from loop_monitor import LoopLagMonitor
 
 router = Router()
 logging.basicConfig(level=logging.INFO)
-MAPPING_FILE = "mapping.json"
+
+# Barcha chiquvchi Bot API so'rovlari uchun limiter (copy, edit, delete)
+rate_limiter = RateLimiter(RATE_LIMIT_GLOBAL, RATE_LIMIT_PER_CHAT, RATE_LIMIT_CHAT_BURST)
+
+# Vaqtinchalik xatolar (429, tarmoq) uchun fon qayta urinish navbati
+retry_scheduler = RetryScheduler(RETRY_MAX_ATTEMPTS, RETRY_BASE_DELAY, limiter=rate_limiter)
 
 # Admin config fayllar
 ADMIN_CONFIG_FILE = "admin_config.json"
@@ -29,41 +61,88 @@ MODEL_KEYWORDS_FILE = "model_keywords.json"
 REGION_KEYWORDS_FILE = "region_keywords.json"
 ADMIN_USERS_FILE = "admin_users.json"
 
-# Global lock for file operations
-file_lock = asyncio.Lock()
+# Config kesh - fayllar faqat birinchi marta o'qiladi, save_* keshni yangilaydi
+config_cache = {}     # fayl → ma'lumot (faqat o'qish uchun)
+config_versions = {}  # fayl → versiya (har bir saqlashda oshadi)
+
+keyword_matcher = None  # Joriy kalit so'zlar versiyasi uchun matcher
+routing_table = None    # Joriy admin config versiyasi uchun (model, viloyat) → kanallar
+
+# Albomlar (media group) - bir xil media_group_id li postlar qisqa vaqt yig'iladi
+media_groups = {}  # media_group_id → {"messages": [...], "last": oxirgi qism vaqti}
+
+# Editlarni birlashtirish - post_id bo'yicha
+pending_edits = {}  # post_id → {"msg": oxirgi edit, "last": oxirgi edit vaqti}
+edit_tasks = {}     # post_id → ishlayotgan tarqatish vazifasi
+
+# Kanal adminlari - TTL bilan keshlanadi (har bir tekshiruvda API so'rovi yo'q)
+channel_admins = AdminRoster(MAIN_CHANNEL_ID, ttl=ADMIN_CACHE_TTL)
+
+# Event loop bloklanishini o'lchash (statistikada ko'rsatiladi)
+loop_monitor = LoopLagMonitor()
+
+# Mapping saqlash - json (xotira + journal), partitioned yoki sqlite backend
+mapping_store = create_mapping_store(
+    MAPPING_BACKEND,
+    path=MAPPING_FILE,
+    db_path=MAPPING_DB_FILE,
+    partition_dir=MAPPING_PARTITION_DIR,
+    binary_path=MAPPING_BINARY_FILE,
+    snapshot_every=MAPPING_SNAPSHOT_EVERY,
+    commit_window=MAPPING_COMMIT_WINDOW,
+    durability=MAPPING_DURABILITY
+)
+
+# Config kesh yordamchilari
+def cache_config(path, data):
+    """Saqlangan ma'lumotni keshga qo'yish - JSON orqali, diskdagi ko'rinish bilan bir xil"""
+    config_cache[path] = json.loads(json.dumps(data, ensure_ascii=False))
+    config_versions[path] = config_versions.get(path, 0) + 1
+
+def read_config_file(path):
+    """Faylni bir marta keshga o'qish - fayl yo'q bo'lsa None"""
+    if path not in config_cache:
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                cache_config(path, json.load(f))
+        except FileNotFoundError:
+            return None
+    return config_cache[path]
 
 # Admin config yuklash/saqlash
-async def load_admin_config():
-    """Admin config ni yuklash"""
-    try:
-        with open(ADMIN_CONFIG_FILE, "r", encoding="utf-8") as f:
-            return json.load(f)
-    except FileNotFoundError:
+async def get_admin_config():
+    """Admin config - keshdagi nusxa, faqat o'qish uchun"""
+    config = read_config_file(ADMIN_CONFIG_FILE)
+    if config is None:
         # Default config - config.py dan olish
-        default_config = {
+        config = {
             "model_channels": dict(MODEL_CHANNEL_MAP),
             "region_channels": {},  # Yangi - viloyat kanallari
             "always_send_to": list(ALWAYS_SEND_TO),
             "channel_names": dict(CHANNEL_NAMES)
         }
-        await save_admin_config(default_config)
-        return default_config
+        await save_admin_config(config)
+        config = config_cache.get(ADMIN_CONFIG_FILE, config)
+    return config
+
+async def load_admin_config():
+    """Admin config ni yuklash (o'zgartirish uchun nusxa)"""
+    return copy.deepcopy(await get_admin_config())
 
 async def save_admin_config(config):
-    """Admin config ni saqlash"""
+    """Admin config ni saqlash va keshni yangilash"""
     try:
         with open(ADMIN_CONFIG_FILE, "w", encoding="utf-8") as f:
             json.dump(config, f, ensure_ascii=False, indent=2)
+        cache_config(ADMIN_CONFIG_FILE, config)
     except Exception as e:
         logging.error(f"❌ Admin config saqlashda xato: {e}")
 
 # Model keywords yuklash/saqlash
-async def load_model_keywords():
-    """Model keywords ni yuklash"""
-    try:
-        with open(MODEL_KEYWORDS_FILE, "r", encoding="utf-8") as f:
-            return json.load(f)
-    except FileNotFoundError:
+async def get_model_keywords():
+    """Model keywords - keshdagi nusxa, faqat o'qish uchun"""
+    keywords = read_config_file(MODEL_KEYWORDS_FILE)
+    if keywords is None:
         # Default keywords
         default_keywords = {
             "damas": ["damas", "дамас", "#damas", "#дамас"],
@@ -73,23 +152,27 @@ async def load_model_keywords():
             "nexia": ["nexia", "нексия", "#nexia", "#нексия"]
         }
         await save_model_keywords(default_keywords)
-        return default_keywords
+        keywords = config_cache.get(MODEL_KEYWORDS_FILE, default_keywords)
+    return keywords
+
+async def load_model_keywords():
+    """Model keywords ni yuklash (o'zgartirish uchun nusxa)"""
+    return copy.deepcopy(await get_model_keywords())
 
 async def save_model_keywords(keywords):
-    """Model keywords ni saqlash"""
+    """Model keywords ni saqlash va keshni yangilash"""
     try:
         with open(MODEL_KEYWORDS_FILE, "w", encoding="utf-8") as f:
             json.dump(keywords, f, ensure_ascii=False, indent=2)
+        cache_config(MODEL_KEYWORDS_FILE, keywords)
     except Exception as e:
         logging.error(f"❌ Model keywords saqlashda xato: {e}")
 
 # Region keywords yuklash/saqlash
-async def load_region_keywords():
-    """Viloyat keywords ni yuklash"""
-    try:
-        with open(REGION_KEYWORDS_FILE, "r", encoding="utf-8") as f:
-            return json.load(f)
-    except FileNotFoundError:
+async def get_region_keywords():
+    """Viloyat keywords - keshdagi nusxa, faqat o'qish uchun"""
+    keywords = read_config_file(REGION_KEYWORDS_FILE)
+    if keywords is None:
         # Default region keywords
         default_keywords = {
             "toshkent": ["toshkent", "ташкент", "tashkent", "toshkent shahar", "тошкент"],
@@ -99,49 +182,57 @@ async def load_region_keywords():
             "fargona": ["fargona", "фергана", "fergana", "farg'ona"]
         }
         await save_region_keywords(default_keywords)
-        return default_keywords
+        keywords = config_cache.get(REGION_KEYWORDS_FILE, default_keywords)
+    return keywords
+
+async def load_region_keywords():
+    """Viloyat keywords ni yuklash (o'zgartirish uchun nusxa)"""
+    return copy.deepcopy(await get_region_keywords())
 
 async def save_region_keywords(keywords):
-    """Viloyat keywords ni saqlash"""
+    """Viloyat keywords ni saqlash va keshni yangilash"""
     try:
         with open(REGION_KEYWORDS_FILE, "w", encoding="utf-8") as f:
             json.dump(keywords, f, ensure_ascii=False, indent=2)
+        cache_config(REGION_KEYWORDS_FILE, keywords)
     except Exception as e:
         logging.error(f"❌ Region keywords saqlashda xato: {e}")
 
+# Kalit so'z matcher (Aho-Corasick) - faqat kalit so'zlar o'zgarganda qayta quriladi
+async def get_keyword_matcher():
+    """Joriy kalit so'zlar versiyasi uchun matcher"""
+    global keyword_matcher
+    model_keywords = await get_model_keywords()
+    region_keywords = await get_region_keywords()
+    version = (config_versions.get(MODEL_KEYWORDS_FILE), config_versions.get(REGION_KEYWORDS_FILE))
+    if keyword_matcher is None or keyword_matcher.version != version:
+        keyword_matcher = KeywordMatcher(
+            {"model": model_keywords, "region": region_keywords},
+            version=version
+        )
+        logging.info(f"🔤 Kalit so'z matcher qurildi (versiya {version})")
+    return keyword_matcher
+
+async def detect_model_and_region(text: str) -> tuple[str | None, str | None]:
+    """Model va viloyatni matndan bir o'tishda aniqlash"""
+    if not text:
+        return None, None
+    found = (await get_keyword_matcher()).match(text)
+    return found["model"], found["region"]
+
 # Viloyat detection funksiyasi
 async def detect_region(text: str) -> str | None:
     """Viloyat detection - keywords asosida"""
-    if not text:
-        return None
-        
-    text = text.lower()
-    keywords = await load_region_keywords()
-    
-    for region, region_keywords in keywords.items():
-        for keyword in region_keywords:
-            if keyword.lower() in text:
-                return region
-    return None
+    return (await detect_model_and_region(text))[1]
 
 async def detect_model_advanced(text: str) -> str | None:
     """Yangi model detection - keywords asosida"""
-    if not text:
-        return None
-        
-    text = text.lower()
-    keywords = await load_model_keywords()
-    
-    for model, model_keywords in keywords.items():
-        for keyword in model_keywords:
-            if keyword.lower() in text:
-                return model
-    return None
+    return (await detect_model_and_region(text))[0]
 
 # Dynamic config olish
 async def get_current_config():
-    """Hozirgi config ni olish"""
-    admin_config = await load_admin_config()
+    """Hozirgi config ni olish (keshdan, fayl o'qimasdan)"""
+    admin_config = await get_admin_config()
     return {
         "model_channels": admin_config.get("model_channels", MODEL_CHANNEL_MAP),
         "region_channels": admin_config.get("region_channels", {}),  # Yangi
@@ -149,28 +240,44 @@ async def get_current_config():
         "channel_names": admin_config.get("channel_names", CHANNEL_NAMES)
     }
 
+# Routing jadvali - faqat admin config o'zgarganda qayta quriladi
+async def get_routing_table():
+    """Joriy admin config versiyasi uchun routing jadvali"""
+    global routing_table
+    config = await get_current_config()
+    version = config_versions.get(ADMIN_CONFIG_FILE)
+    if routing_table is None or routing_table.version != version:
+        routing_table = RoutingTable(config, version=version)
+        logging.info(f"🧭 Routing jadvali qurildi: {len(routing_table)} ta kombinatsiya (versiya {version})")
+    return routing_table
+
 # Admin users yuklash/saqlash
-async def load_admin_users():
-    """Admin foydalanuvchilar ro'yxatini yuklash"""
-    try:
-        with open(ADMIN_USERS_FILE, "r", encoding="utf-8") as f:
-            return json.load(f)
-    except FileNotFoundError:
+async def get_admin_users():
+    """Admin foydalanuvchilar - keshdagi nusxa, faqat o'qish uchun"""
+    users = read_config_file(ADMIN_USERS_FILE)
+    if users is None:
         # Default - faqat kanal adminlari
         default_users = {
             "channel_admins": True,  # Kanal adminlari ham admin
             "custom_admins": []      # Qo'shimcha admin user ID lar
         }
         await save_admin_users(default_users)
-        return default_users
+        users = config_cache.get(ADMIN_USERS_FILE, default_users)
+    return users
+
+async def load_admin_users():
+    """Admin foydalanuvchilar ro'yxatini yuklash (o'zgartirish uchun nusxa)"""
+    return copy.deepcopy(await get_admin_users())
 
 async def save_admin_users(users):
-    """Admin foydalanuvchilar ro'yxatini saqlash"""
+    """Admin foydalanuvchilar ro'yxatini saqlash va keshni yangilash"""
     try:
         with open(ADMIN_USERS_FILE, "w", encoding="utf-8") as f:
             json.dump(users, f, ensure_ascii=False, indent=2)
+        cache_config(ADMIN_USERS_FILE, users)
     except Exception as e:
         logging.error(f"❌ Admin users saqlashda xato: {e}")
+    channel_admins.invalidate()
 
 # Yaxshilangan admin tekshirish
 async def is_admin(user_id: int, bot) -> bool:
@@ -180,189 +287,43 @@ async def is_admin(user_id: int, bot) -> bool:
         if user_id == BOT_OWNER_ID:
             return True
         
-        admin_users = await load_admin_users()
+        admin_users = await get_admin_users()
         
         # 2. Custom admin ro'yxatida tekshirish
         if user_id in admin_users.get("custom_admins", []):
             return True
         
-        # 3. Kanal adminlari tekshiruvi (agar yoqilgan bo'lsa)
+        # 3. Kanal adminlari tekshiruvi (agar yoqilgan bo'lsa) - keshdan
         if admin_users.get("channel_admins", True):
-            member = await bot.get_chat_member(MAIN_CHANNEL_ID, user_id)
-            return member.status in ["administrator", "creator"]
+            return await channel_admins.contains(bot, user_id)
             
         return False
     except:
         # Xato bo'lsa, owner tekshiruvi
         return user_id == BOT_OWNER_ID
 
-# Optimallashtirilgan mapping saqlash (katta kanallar uchun)
-async def save_mapping_optimized(data):
-    """Mapping ni kichik hajmda saqlash"""
-    async with file_lock:
-        try:
-            # Backup yaratish
-            import shutil
-            try:
-                shutil.copy(MAPPING_FILE, f"{MAPPING_FILE}.backup")
-            except FileNotFoundError:
-                pass
-            
-            # Eski mapping ni yuklash
-            old_mapping = {}
-            try:
-                with open(MAPPING_FILE, "r", encoding="utf-8") as f:
-                    old_mapping = json.load(f)
-            except (FileNotFoundError, json.JSONDecodeError):
-                pass
-            
-            # Yangi ma'lumotlarni qo'shish va timestamp qo'shish
-            current_timestamp = int(time.time())
-            
-            for post_id, post_data in data.items():
-                if post_id not in old_mapping:
-                    # Yangi post - timestamp va siqilgan format
-                    if isinstance(post_data, dict) and "reply_to" not in post_data:
-                        # Oddiy post - faqat kerakli ma'lumotlar
-                        old_mapping[post_id] = {
-                            "c": post_data,  # channels - qisqa nom
-                            "t": current_timestamp  # timestamp - qisqa nom
-                        }
-                    elif isinstance(post_data, dict) and "reply_to" in post_data:
-                        # Reply post  
-                        old_mapping[post_id] = {
-                            "r": post_data["reply_to"],  # reply_to - qisqa
-                            "c": post_data["targets"],   # channels - qisqa
-                            "t": current_timestamp       # timestamp - qisqa
-                        }
-                else:
-                    old_mapping[post_id] = data[post_id]
-            
-            # Atomic write - temp fayl orqali
-            temp_file = f"{MAPPING_FILE}.tmp"
-            with open(temp_file, "w", encoding="utf-8") as f:
-                json.dump(old_mapping, f, ensure_ascii=False, separators=(',', ':'))  # Compact JSON
-            
-            # Temp faylni asosiy faylga ko'chirish
-            os.replace(temp_file, MAPPING_FILE)
-            
-        except Exception as e:
-            logging.error(f"❌ Mapping saqlashda xato: {e}")
-
-# Optimallashtirilgan mapping yuklash
-async def load_mapping_optimized():
-    """Siqilgan mapping ni yuklash va o'qish"""
-    async with file_lock:
-        try:
-            with open(MAPPING_FILE, "r", encoding="utf-8") as f:
-                compressed_mapping = json.load(f)
-            
-            # Eski formatdan yangi formatga o'tkazish
-            normal_mapping = {}
-            for post_id, post_data in compressed_mapping.items():
-                if isinstance(post_data, dict):
-                    if "c" in post_data and "t" in post_data:
-                        if "r" in post_data:
-                            # Reply format
-                            normal_mapping[post_id] = {
-                                "reply_to": post_data["r"],
-                                "targets": post_data["c"],
-                                "_timestamp": post_data["t"]
-                            }
-                        else:
-                            # Oddiy post format
-                            normal_mapping[post_id] = post_data["c"]
-                            normal_mapping[post_id]["_timestamp"] = post_data["t"]
-                    else:
-                        # Eski format - o'zgartirishsiz
-                        normal_mapping[post_id] = post_data
-                else:
-                    normal_mapping[post_id] = post_data
-            
-            return normal_mapping
-        except FileNotFoundError:
-            return {}
-        except json.JSONDecodeError:
-            logging.error("❌ JSON fayl buzilgan, yangi mapping yaratilmoqda")
-            return {}
-
-# Mapping yuklash (optimallashtirilgan)
-async def load_mapping():
-    return await load_mapping_optimized()
-
-# Mapping saqlash (optimallashtirilgan)  
-async def save_mapping(data):
-    await save_mapping_optimized(data)
-
 # Aggressive 45 kunlik tozalash (katta kanallar uchun)
 async def aggressive_45day_cleanup():
     """Katta kanallar uchun - 45 kundan eski mapping larni tezda o'chirish"""
     try:
-        mapping = await load_mapping_optimized()
-        if not mapping:
+        total_size = await mapping_store.count()
+        if not total_size:
             return 0
-            
-        current_time = int(time.time())
-        cutoff_time = current_time - (45 * 24 * 60 * 60)  # 45 kun
-        
-        old_entries = []
-        total_size = len(mapping)
-        
-        for post_id, post_data in list(mapping.items()):
-            if post_id in ["reply_to", "targets"]:
-                continue
-                
-            try:
-                # Timestamp tekshirish
-                timestamp = current_time  # Default - hozirgi vaqt
-                
-                if isinstance(post_data, dict):
-                    timestamp = post_data.get("_timestamp", timestamp)
-                    if timestamp is None or timestamp == 0:
-                        # Eski format yoki noto'g'ri timestamp
-                        try:
-                            post_id_int = int(post_id)
-                            # Taxminiy vaqt - Telegram message ID asosida
-                            if post_id_int < 1000000:
-                                # Juda eski ID - 45 kundan eski deb hisoblash
-                                timestamp = cutoff_time - 1
-                            else:
-                                timestamp = current_time
-                        except ValueError:
-                            timestamp = cutoff_time - 1  # Noto'g'ri format - o'chirish
-                
-                # 45 kundan eski ekanligini tekshirish
-                if timestamp < cutoff_time:
-                    old_entries.append(post_id)
-                    
-            except Exception as e:
-                # Xato bo'lsa, o'chirish
-                old_entries.append(post_id)
-                continue
-        
-        # Eski yozuvlarni o'chirish
-        cleaned_count = 0
-        if old_entries:
-            fresh_mapping = await load_mapping_optimized()
-            
-            for old_post_id in old_entries:
-                if old_post_id in fresh_mapping:
-                    del fresh_mapping[old_post_id]
-                    cleaned_count += 1
-            
-            if cleaned_count > 0:
-                await save_mapping_optimized(fresh_mapping)
-                logging.info(f"🗑 Aggressive tozalash: {cleaned_count}/{total_size} ta eski yozuv o'chirildi")
-                
-                # Mapping fayl hajmini ko'rsatish
-                try:
-                    file_size = os.path.getsize(MAPPING_FILE) / (1024 * 1024)  # MB
-                    logging.info(f"💾 Mapping fayl hajmi: {file_size:.2f} MB")
-                except:
-                    pass
-        
+
+        cutoff_time = int(time.time()) - (45 * 24 * 60 * 60)  # 45 kun
+        cleaned_count = await mapping_store.expire(cutoff_time)
+
+        if cleaned_count > 0:
+            # Tozalashdan keyin journal ni snapshot ga yig'ish
+            await mapping_store.snapshot()
+            logging.info(f"🗑 Aggressive tozalash: {cleaned_count}/{total_size} ta eski yozuv o'chirildi")
+
+            # Mapping fayl hajmini ko'rsatish
+            file_size = await mapping_store.disk_size() / (1024 * 1024)  # MB
+            logging.info(f"💾 Mapping fayl hajmi: {file_size:.2f} MB")
+
         return cleaned_count
-                
+
     except Exception as e:
         logging.error(f"❌ Aggressive tozalashda xato: {e}")
         return 0
@@ -375,28 +336,23 @@ async def daily_mapping_cleanup(bot):
             # 24 soat (1 kun) kutish
             await asyncio.sleep(24 * 60 * 60)
             
-            mapping = await load_mapping_optimized()
-            if not mapping:
+            mapping_size = await mapping_store.count()
+            if not mapping_size:
                 continue
                 
-            mapping_size = len(mapping)
             logging.info(f"📊 Kunlik mapping tekshiruvi: {mapping_size} ta yozuv")
             
             # 45 kunlik tozalash
             cleaned = await aggressive_45day_cleanup()
             
             if cleaned > 0:
-                new_mapping = await load_mapping_optimized()
-                new_size = len(new_mapping)
+                new_size = await mapping_store.count()
                 logging.info(f"✅ Kunlik tozalash tugadi: {cleaned} ta eski yozuv o'chirildi")
                 logging.info(f"📊 Mapping hajmi: {mapping_size} → {new_size}")
                 
                 # Fayl hajmini ko'rsatish
-                try:
-                    file_size = os.path.getsize(MAPPING_FILE) / (1024 * 1024)  # MB
-                    logging.info(f"💾 Mapping fayl hajmi: {file_size:.2f} MB")
-                except:
-                    pass
+                file_size = await mapping_store.disk_size() / (1024 * 1024)  # MB
+                logging.info(f"💾 Mapping fayl hajmi: {file_size:.2f} MB")
             else:
                 logging.info("✅ Kunlik tekshiruv: 45 kundan eski mapping yozuv yo'q")
             
@@ -407,8 +363,83 @@ async def daily_mapping_cleanup(bot):
 async def start_auto_delete_checker(bot):
     """Faqat kunlik mapping tozalash"""
     asyncio.create_task(daily_mapping_cleanup(bot))
+    loop_monitor.start()
     logging.info("🔄 Kunlik mapping tozalash tizimi yoqildi (45 kun)")
 
+# Xabarlarni chat bo'yicha guruhlab bulk o'chirish
+async def delete_messages_bulk(bot, messages_by_chat):
+    """{chat_id: [message_id, ...]} - har bir chat uchun delete_messages, chatlar parallel
+
+    O'chirilgan xabarlar sonini qaytaradi. Vaqtinchalik xatolar fonda qayta uriniladi.
+    """
+    requests = []
+    for chat_id, message_ids in messages_by_chat.items():
+        # delete_messages bir so'rovda ko'pi bilan 100 ta xabar qabul qiladi
+        for i in range(0, len(message_ids), 100):
+            requests.append((chat_id, tuple(message_ids[i:i + 100])))
+
+    async def delete_chunk(request):
+        chat_id, message_ids = request
+        return await rate_limiter.call(bot.delete_messages, chat_id=chat_id, message_ids=list(message_ids))
+
+    result = await fan_out(requests, delete_chunk, FANOUT_CONCURRENCY)
+
+    for (chat_id, message_ids), e in result.failed.items():
+        logging.error(f"❌ O'chirishda xato {chat_id} ({len(message_ids)} ta xabar): {e}")
+        retry_scheduler.schedule(
+            f"O'chirish {chat_id} → {list(message_ids)}",
+            partial(delete_chunk, (chat_id, message_ids)),
+            e,
+            chat_id=chat_id
+        )
+    deleted = sum(len(message_ids) for _, message_ids in result.ok)
+    logging.info(f"🗑 Bulk o'chirish: {deleted} ta xabar, {len(messages_by_chat)} ta chat, {result.elapsed:.2f} s")
+    return deleted
+
+# Postlarni asosiy kanal va barcha nishon kanallardan o'chirish
+async def delete_posts_everywhere(bot, source_ids):
+    """Manba postlar + ularning nusxalari + barcha javob (reply) nusxalarini o'chirish
+
+    Javoblar thread indeksi orqali topiladi. Asosiy kanaldan faqat so'ralgan
+    postlarning o'zi o'chiriladi. O'chirilgan xabarlar sonini qaytaradi.
+    """
+    messages_by_chat = {MAIN_CHANNEL_ID: [int(source_id) for source_id in source_ids]}
+
+    async def collect_thread():
+        thread_ids = []
+        for source_id in source_ids:
+            thread_ids.extend(await mapping_store.thread(source_id))
+        return list(dict.fromkeys(thread_ids))
+
+    # Thread postlari qulflanadi - tarqatilayotgan post/reply tugashini kutib, keyin o'chirish.
+    # Reply ota qulfini ham oladi, shuning uchun qulf olingandan keyin thread o'sishi
+    # mumkin - yangi javoblar ham qulflanib, thread o'zgarmay qolguncha qayta o'qiladi
+    async with contextlib.AsyncExitStack() as stack:
+        held = set()
+        while True:
+            thread_ids = await collect_thread()
+            new_ids = [thread_id for thread_id in thread_ids if thread_id not in held]
+            if not new_ids:
+                break
+            await stack.enter_async_context(mapping_store.locked(*new_ids))
+            held.update(new_ids)
+
+        for thread_id in thread_ids:
+            entry = await mapping_store.get(thread_id)
+            if entry is None:
+                continue
+            for chat_id, msg_id in entry.targets().items():
+                messages_by_chat.setdefault(chat_id, []).append(msg_id)
+
+        if len(thread_ids) > len(source_ids):
+            logging.info(f"🧵 Thread bo'yicha o'chirish: {len(thread_ids) - len(source_ids)} ta javob ham o'chiriladi")
+        deleted = await delete_messages_bulk(bot, messages_by_chat)
+
+        # Mapping'dan bitta tranzaksiyada o'chirish
+        removed = await mapping_store.delete_many(thread_ids)
+        logging.info(f"✅ Mapping'dan o'chirildi: {removed} ta yozuv")
+    return deleted
+
 # Test komandalar
 @router.message(Command("ping"))
 async def ping(msg: Message):
@@ -419,66 +450,165 @@ async def test_admin(msg: Message, bot):
     admin_status = await is_admin(msg.from_user.id, bot)
     await msg.answer(f"Admin: {admin_status}\nUser ID: {msg.from_user.id}")
 
+# Post matnidan nishon kanallarni aniqlash
+async def resolve_targets(text):
+    """Model/viloyat detection + routing jadvalidan nishonlar"""
+    # Model va viloyat detection (bitta o'tishda)
+    model, region = await detect_model_and_region(text)
+    
+    # Nishonlar - oldindan qurilgan jadvaldan bitta qidiruv
+    routes = await get_routing_table()
+    targets = routes.targets(model, region)
+
+    if model and routes.has_model(model):
+        logging.info(f"🎯 Model aniqlandi: {model}")
+    if region and routes.has_region(region):
+        logging.info(f"🗺️ Viloyat aniqlandi: {region}")
+    
+    if model or region:
+        logging.info(f"📍 Targets: {targets} (Model: {model}, Viloyat: {region})")
+    else:
+        logging.info(f"🎯 Model/Viloyat aniqlanmadi, faqat ALWAYS_SEND_TO: {targets}")
+    return targets
+
+# Albom qismini buferga qo'shish
+def buffer_media_group(msg: Message, bot):
+    """Albom qismlarini yig'ish - oxirgi qismdan MEDIA_GROUP_WAIT sekund o'tgach tarqatiladi"""
+    group = media_groups.get(msg.media_group_id)
+    if group is None:
+        group = media_groups[msg.media_group_id] = {"messages": [], "last": 0}
+        asyncio.create_task(flush_media_group(msg.media_group_id, bot))
+    group["messages"].append(msg)
+    group["last"] = time.monotonic()
+
+async def flush_media_group(media_group_id, bot):
+    # Yangi qism kelib tursa - kutishni davom ettirish
+    group = media_groups[media_group_id]
+    while True:
+        delay = group["last"] + MEDIA_GROUP_WAIT - time.monotonic()
+        if delay <= 0:
+            break
+        await asyncio.sleep(delay)
+    del media_groups[media_group_id]
+    await handle_media_group(group["messages"], bot)
+
+# Albomni bitta copy_messages bilan tarqatish
+async def handle_media_group(messages, bot):
+    """Albomni har bir kanalga bitta so'rov bilan nusxalash, mapping har bir qism uchun"""
+    try:
+        messages = sorted(messages, key=lambda m: m.message_id)
+        source_ids = [m.message_id for m in messages]
+        logging.info(f"🖼 Albom aniqlandi: {source_ids}")
+
+        text = next((m.caption for m in messages if m.caption), "")
+        targets = await resolve_targets(text)
+
+        async def send_group(chat_id):
+            sent = await rate_limiter.call(
+                bot.copy_messages,
+                chat_id=chat_id,
+                from_chat_id=messages[0].chat.id,
+                message_ids=source_ids
+            )
+            return [m.message_id for m in sent]
+
+        def group_pairs(chat_id, sent_ids):
+            # Telegram qismni tashlab ketgan bo'lsa qaysi nusxa qaysi qismniki - noma'lum,
+            # noto'g'ri juftlash keyingi edit/o'chirishni boshqa xabarga yo'naltiradi
+            if len(sent_ids) != len(source_ids):
+                logging.error(f"❌ Albom {source_ids[0]} → {chat_id}: {len(source_ids)} ta qismdan "
+                              f"{len(sent_ids)} tasi nusxalandi, mapping saqlanmaydi")
+                return []
+            return zip(source_ids, sent_ids)
+
+        async def save_group_copies(chat_id, sent_ids):
+            for source_id, sent_id in group_pairs(chat_id, sent_ids):
+                await mapping_store.add_target(source_id, chat_id, sent_id)
+
+        # Tarqatish tugaguncha qism postlar qulflanadi - qayta urinish va edit kutadi
+        async with mapping_store.locked(*source_ids):
+            # Barcha kanallarga parallel yuborish
+            result = await fan_out(targets, send_group, FANOUT_CONCURRENCY)
+            group_mapping = {source_id: {} for source_id in source_ids}
+
+            for chat_id, sent_ids in result.ok.items():
+                for source_id, sent_id in group_pairs(chat_id, sent_ids):
+                    group_mapping[source_id][chat_id] = sent_id
+                logging.info(f"✅ Albom yuborildi: {chat_id} → {sent_ids}")
+            for chat_id, e in result.failed.items():
+                logging.error(f"❌ Albom yuborishda xato {chat_id}: {e}")
+                retry_scheduler.schedule(
+                    f"Albom {source_ids[0]} → {chat_id}",
+                    partial(send_group, chat_id),
+                    e,
+                    on_success=partial(save_group_copies, chat_id),
+                    chat_id=chat_id
+                )
+            logging.info(f"⏱ Albom tarqatildi: {len(result.ok)}/{len(targets)} ta kanal, {result.elapsed:.2f} s")
+
+            # Har bir qism alohida yozuv - edit va o'chirish qism bo'yicha ishlaydi
+            for source_msg in messages:
+                copies = group_mapping[source_msg.message_id]
+                if copies:
+                    record = MappingRecord(copies, fingerprint=content_fingerprint(source_msg))
+                    await mapping_store.put(source_msg.message_id, record)
+
+    except Exception as e:
+        logging.error(f"❌ ALBOMDA XATO: {e}")
+        import traceback
+        logging.error(traceback.format_exc())
+
 # Asosiy kanalga yangi post (reply emas)
 @router.channel_post(F.chat.id == MAIN_CHANNEL_ID, ~F.reply_to_message)
 async def handle_post(msg: Message, bot):
+    if msg.media_group_id:
+        # Albom qismi - butun albom yig'ilgach tarqatiladi
+        buffer_media_group(msg, bot)
+        return
+
     try:
         logging.info(f"🆕 Yangi post aniqlandi: {msg.message_id}")
         
-        # Model va viloyat detection
-        model = await detect_model_advanced(msg.text or msg.caption or "")
-        region = await detect_region(msg.text or msg.caption or "")
-        
-        config = await get_current_config()
-        targets = set(config["always_send_to"])
-
-        # Model kanallari qo'shish
-        if model and model in config["model_channels"]:
-            targets.update(config["model_channels"][model])
-            logging.info(f"🎯 Model aniqlandi: {model}")
-        
-        # Viloyat kanallari qo'shish
-        if region and region in config["region_channels"]:
-            targets.update(config["region_channels"][region])
-            logging.info(f"🗺️ Viloyat aniqlandi: {region}")
-        
-        if model or region:
-            logging.info(f"📍 Targets: {targets} (Model: {model}, Viloyat: {region})")
-        else:
-            logging.info(f"🎯 Model/Viloyat aniqlanmadi, faqat ALWAYS_SEND_TO: {targets}")
-
-        # Mapping'ni OLDIN yuklash
-        mapping = await load_mapping()
-        post_mapping = {}
-        successful_targets = []
-
-        for chat_id in targets:
-            try:
-                sent = await bot.copy_message(chat_id, msg.chat.id, msg.message_id)
-                post_mapping[str(chat_id)] = sent.message_id
-                successful_targets.append(chat_id)
-                logging.info(f"✅ Post yuborildi: {chat_id} → {sent.message_id}")
-            except Exception as e:
+        targets = await resolve_targets(msg.text or msg.caption or "")
+
+        async def send_post(chat_id):
+            sent = await rate_limiter.call(
+                bot.copy_message,
+                chat_id=chat_id,
+                from_chat_id=msg.chat.id,
+                message_id=msg.message_id
+            )
+            return sent.message_id
+
+        # Mapping saqlanguncha post qulflanadi - qayta urinish (add_target) va edit kutadi
+        async with mapping_store.locked(msg.message_id):
+            # Barcha kanallarga parallel yuborish
+            result = await fan_out(targets, send_post, FANOUT_CONCURRENCY)
+            post_mapping = {}
+
+            for chat_id, sent_id in result.ok.items():
+                post_mapping[chat_id] = sent_id
+                logging.info(f"✅ Post yuborildi: {chat_id} → {sent_id}")
+            for chat_id, e in result.failed.items():
                 logging.error(f"❌ Post yuborishda xato {chat_id}: {e}")
+                retry_scheduler.schedule(
+                    f"Post {msg.message_id} → {chat_id}",
+                    partial(send_post, chat_id),
+                    e,
+                    on_success=partial(mapping_store.add_target, msg.message_id, chat_id),
+                    chat_id=chat_id
+                )
+            logging.info(f"⏱ Post tarqatildi: {len(result.ok)}/{len(targets)} ta kanal, {result.elapsed:.2f} s")
 
-        # Faqat muvaffaqiyatli yuborilgan postlar uchun mapping saqlash
-        if post_mapping:
-            # Mapping'ni QAYTA yuklash (boshqa jarayonlar o'zgartirgan bo'lishi mumkin)
-            fresh_mapping = await load_mapping()
-            fresh_mapping[str(msg.message_id)] = post_mapping
-            await save_mapping(fresh_mapping)
+            # Faqat muvaffaqiyatli yuborilgan postlar uchun mapping saqlash
+            if post_mapping:
+                record = MappingRecord(post_mapping, fingerprint=content_fingerprint(msg))
+                await mapping_store.put(msg.message_id, record)
             
-            logging.info(f"✅ Post mapping saqlandi: {msg.message_id}")
-            logging.info(f"📋 Mapping ma'lumotlari: {post_mapping}")
-            
-            # Tekshirish uchun mapping'ni qayta yuklash
-            verify_mapping = await load_mapping()
-            if str(msg.message_id) in verify_mapping:
-                logging.info(f"✅ Mapping tekshirildi - muvaffaqiyatli saqlandi")
+                logging.info(f"✅ Post mapping saqlandi: {msg.message_id}")
+                logging.info(f"📋 Mapping ma'lumotlari: {post_mapping}")
             else:
-                logging.error(f"❌ Mapping tekshiruvi - saqlanmagan!")
-        else:
-            logging.warning(f"⚠️ Hech qanday post yuborilmadi: {msg.message_id}")
+                logging.warning(f"⚠️ Hech qanday post yuborilmadi: {msg.message_id}")
             
     except Exception as e:
         logging.error(f"❌ POSTDA XATO: {e}")
@@ -494,273 +624,281 @@ async def handle_reply(msg: Message, bot):
             logging.warning("⚠️ Reply to message yo'q")
             return
             
-        reply_to_id = msg.reply_to_message.message_id
-        reply_to = str(reply_to_id)
+        reply_to = msg.reply_to_message.message_id
         
         logging.info(f"📨 Reply aniqlandi: {msg.message_id} → {reply_to}")
         
-        # Mappingni yuklash
-        mapping = await load_mapping()
-        logging.info(f"📋 Mapping keys: {list(mapping.keys())}")
+        original_mapping = await mapping_store.get(reply_to)
         
         # Agar mapping'da yo'q bo'lsa
-        if reply_to not in mapping:
+        if original_mapping is None:
             logging.warning(f"⚠️ Reply uchun mos post topilmadi: {reply_to}")
             
-            # Qo'shimcha debug ma'lumotlari
-            logging.info(f"🔍 Qidirilayotgan kalit: '{reply_to}' (type: {type(reply_to)})")
-            debug_keys = [f"'{k}' (type: {type(k)})" for k in mapping.keys()]
-            logging.info(f"🔍 Mavjud kalitlar: {debug_keys}")
-            
-            # Kichik kechikish va qayta yuklash
+            # Kichik kechikish - post hali tarqatilayotgan bo'lishi mumkin,
+            # boshlangan bo'lsa qulfi bo'shashini (mapping saqlanishini) kutamiz
             await asyncio.sleep(0.2)
-            mapping = await load_mapping()
+            async with mapping_store.locked(reply_to):
+                original_mapping = await mapping_store.get(reply_to)
             
-            if reply_to not in mapping:
+            if original_mapping is None:
                 logging.error(f"❌ Reply uchun mos post hali ham topilmadi: {reply_to}")
-                
-                # Raqamli kalitlarni tekshirish
-                int_key = int(reply_to)
-                if int_key in mapping:
-                    logging.info(f"🔧 Integer kalit topildi: {int_key}")
-                    reply_to = int_key
-                else:
-                    logging.error(f"📋 Mavjud mapping keys: {list(mapping.keys())}")
-                    return
-
-        original_mapping = mapping[reply_to]
+                return
+
         logging.info(f"📋 Original mapping: {original_mapping}")
         
-        reply_map = {}
-        
-        for chat_id_str, target_msg_id in original_mapping.items():
-            # "reply_to" va "targets" kalitlarini o'tkazib yuborish
-            if chat_id_str in ["reply_to", "targets", "_timestamp"]:
-                continue
-                
-            chat_id = int(chat_id_str)
-            try:
-                sent = await bot.copy_message(
-                    chat_id=chat_id,
-                    from_chat_id=msg.chat.id,
-                    message_id=msg.message_id,
-                    reply_to_message_id=target_msg_id
-                )
-                reply_map[chat_id_str] = sent.message_id
-                logging.info(f"✅ Reply yuborildi: {chat_id} → {target_msg_id} (yangi: {sent.message_id})")
-            except Exception as e:
+        # Ota post yoki ota reply - ikkalasida ham {kanal_id: xabar_id}
+        parent_copies = original_mapping.targets()
+        if original_mapping.is_reply:
+            logging.info(f"🧵 Ichma-ich reply: {reply_to} ham {original_mapping.reply_to} ga javob")
+
+        async def send_reply(chat_id):
+            sent = await rate_limiter.call(
+                bot.copy_message,
+                chat_id=chat_id,
+                from_chat_id=msg.chat.id,
+                message_id=msg.message_id,
+                reply_to_message_id=parent_copies[chat_id]
+            )
+            return sent.message_id
+
+        # Reply mapping saqlanguncha reply va ota qulflanadi - unga javob, qayta urinishlar
+        # va ota thread ini o'chirish shu reply saqlanishini kutadi
+        async with mapping_store.locked(reply_to, msg.message_id):
+            # Kutish paytida ota o'chirilgan yoki o'zgargan bo'lishi mumkin
+            original_mapping = await mapping_store.get(reply_to)
+            if original_mapping is None:
+                logging.warning(f"⚠️ Reply ota posti o'chirilgan, reply tarqatilmaydi: {reply_to}")
+                return
+            parent_copies = original_mapping.targets()
+
+            # Barcha nusxalarga parallel javob yuborish
+            result = await fan_out(parent_copies, send_reply, FANOUT_CONCURRENCY)
+            reply_map = {}
+
+            for chat_id, sent_id in result.ok.items():
+                reply_map[chat_id] = sent_id
+                logging.info(f"✅ Reply yuborildi: {chat_id} → {parent_copies[chat_id]} (yangi: {sent_id})")
+            for chat_id, e in result.failed.items():
                 logging.error(f"❌ Reply nusxalashda xato {chat_id}: {e}")
+                retry_scheduler.schedule(
+                    f"Reply {msg.message_id} → {chat_id}",
+                    partial(send_reply, chat_id),
+                    e,
+                    on_success=partial(mapping_store.add_target, msg.message_id, chat_id, reply_to=reply_to),
+                    chat_id=chat_id
+                )
+            logging.info(f"⏱ Reply tarqatildi: {len(result.ok)}/{len(parent_copies)} ta kanal, {result.elapsed:.2f} s")
 
-        if reply_map:
-            # Mapping ni qayta yuklash (boshqa jarayonlar tomonidan o'zgarishi mumkin)
-            mapping = await load_mapping()
-            mapping[str(msg.message_id)] = {
-                "reply_to": str(reply_to), 
-                "targets": reply_map
-            }
-            await save_mapping(mapping)
-            logging.info(f"✅ Reply mapping saqlandi: {msg.message_id} → {reply_map}")
-        else:
-            logging.warning(f"⚠️ Hech qanday reply yuborilmadi: {msg.message_id}")
+            if reply_map:
+                record = MappingRecord(reply_map, reply_to=reply_to, fingerprint=content_fingerprint(msg))
+                await mapping_store.put(msg.message_id, record)
+                logging.info(f"✅ Reply mapping saqlandi: {msg.message_id} → {reply_map}")
+            else:
+                logging.warning(f"⚠️ Hech qanday reply yuborilmadi: {msg.message_id}")
 
     except Exception as e:
         logging.error(f"❌ REPLYDA XATO: {e}")
         import traceback
         logging.error(traceback.format_exc())
 
+# Manba post fingerprint i - edit da nima o'zgarganini aniqlash uchun
+def short_hash(value, entities):
+    """Matn + formatlash uchun qisqa hash (matn yo'q bo'lsa bo'sh)"""
+    if value is None:
+        return ""
+    formatting = json.dumps(
+        [e.model_dump(mode="json", exclude_none=True) for e in entities or []],
+        ensure_ascii=False, sort_keys=True
+    )
+    return hashlib.blake2b((value + formatting).encode("utf-8"), digest_size=8).hexdigest()
+
+def media_unique_id(msg: Message):
+    """Post media sining file_unique_id si (media yo'q bo'lsa bo'sh)"""
+    if msg.photo:
+        return msg.photo[-1].file_unique_id
+    if msg.video:
+        return msg.video.file_unique_id
+    if msg.document:
+        return msg.document.file_unique_id
+    return ""
+
+def content_fingerprint(msg: Message):
+    """Post fingerprint i: "matn_hash:caption_hash:media_id" """
+    return ":".join([
+        short_hash(msg.text, msg.entities),
+        short_hash(msg.caption, msg.caption_entities),
+        media_unique_id(msg)
+    ])
+
+# Edit so'rovini bir marta tayyorlash
+def build_edit_request(msg: Message, old_fingerprint=None):
+    """Manba postdan edit so'rovi - (bot metodi nomi, parametrlar) yoki None
+
+    Agar eski fingerprint bo'yicha media o'zgarmagan bo'lsa, media qayta
+    yuklanmaydi - faqat caption edit qilinadi.
+    """
+    if msg.text:
+        # Faqat matn
+        return "edit_message_text", {"text": msg.text, "entities": msg.entities}
+    media_id = media_unique_id(msg)
+    if media_id and old_fingerprint and old_fingerprint.split(":")[2] == media_id:
+        # Media o'sha - arzonroq caption edit
+        return "edit_message_caption", {"caption": msg.caption, "caption_entities": msg.caption_entities}
+    if msg.photo:
+        # Rasm + caption
+        media = InputMediaPhoto(
+            media=msg.photo[-1].file_id,  # Eng katta o'lcham
+            caption=msg.caption,
+            caption_entities=msg.caption_entities
+        )
+        return "edit_message_media", {"media": media}
+    if msg.video:
+        # Video + caption
+        media = InputMediaVideo(
+            media=msg.video.file_id,
+            caption=msg.caption,
+            caption_entities=msg.caption_entities
+        )
+        return "edit_message_media", {"media": media}
+    if msg.document:
+        # Document + caption
+        media = InputMediaDocument(
+            media=msg.document.file_id,
+            caption=msg.caption,
+            caption_entities=msg.caption_entities
+        )
+        return "edit_message_media", {"media": media}
+    if msg.caption:
+        # Faqat caption (fallback)
+        return "edit_message_caption", {"caption": msg.caption, "caption_entities": msg.caption_entities}
+    # Boshqa media turlari
+    return None
+
+# Edit ni barcha nusxalarga parallel tarqatish
+async def propagate_edit(bot, post_id, copies, request):
+    """Tayyor edit so'rovini barcha nusxalarga qo'llash - FanOutResult"""
+    method_name, params = request
+    method = getattr(bot, method_name)
+
+    async def edit_copy(chat_id):
+        return await rate_limiter.call(
+            method,
+            chat_id=chat_id,
+            message_id=copies[chat_id],
+            **params
+        )
+
+    result = await fan_out(copies, edit_copy, FANOUT_CONCURRENCY)
+
+    for chat_id in result.ok:
+        # Nusxa yangi edit bilan yangilandi - eski editning qayta urinishi uni qaytarmasin
+        retry_scheduler.cancel(("edit", chat_id, copies[chat_id]))
+        logging.info(f"✅ Edit qilindi: {chat_id} → {copies[chat_id]}")
+    for chat_id, e in result.failed.items():
+        logging.error(f"❌ Edit qilishda xato {chat_id}: {e}")
+        retry_scheduler.schedule(
+            f"Edit {post_id} → {chat_id}",
+            partial(edit_copy, chat_id),
+            e,
+            key=("edit", chat_id, copies[chat_id]),
+            chat_id=chat_id
+        )
+    return result
+
 # Asosiy kanalda post edit qilinganda - faqat adminlar
 @router.edited_channel_post(F.chat.id == MAIN_CHANNEL_ID)
 async def handle_edit_post(msg: Message, bot):
     # Channel post da from_user yo'q, shuning uchun admin tekshiruvini o'tkazib yuboramiz
     # Chunki faqat channel adminlari edit qila oladi
-    
+
+    # Ketma-ket editlar birlashtiriladi - faqat oxirgisi tarqatiladi
+    post_id = str(msg.message_id)
+    logging.info(f"✏️ Post edit aniqlandi: {post_id}")
+    pending = pending_edits.get(post_id)
+    if pending is None:
+        pending_edits[post_id] = {"msg": msg, "last": time.monotonic()}
+        asyncio.create_task(flush_edit(post_id, bot))
+    else:
+        if (msg.edit_date or 0) >= (pending["msg"].edit_date or 0):
+            pending["msg"] = msg
+        pending["last"] = time.monotonic()
+        logging.info(f"✏️ Edit birlashtirildi: {post_id}")
+
+    # Eskirgan (hali tugamagan) tarqatishni bekor qilish
+    inflight = edit_tasks.get(post_id)
+    if inflight is not None and not inflight.done():
+        inflight.cancel()
+        logging.info(f"⏹ Eski edit tarqatish bekor qilindi: {post_id}")
+
+async def flush_edit(post_id, bot):
+    # Oxirgi editdan EDIT_DEBOUNCE sekund jimlikni kutish
+    pending = pending_edits[post_id]
+    while True:
+        delay = pending["last"] + EDIT_DEBOUNCE - time.monotonic()
+        if delay <= 0:
+            break
+        await asyncio.sleep(delay)
+    del pending_edits[post_id]
+
+    task = edit_tasks[post_id] = asyncio.create_task(apply_edit(pending["msg"], bot))
+    task.add_done_callback(
+        lambda t: edit_tasks.pop(post_id, None) if edit_tasks.get(post_id) is t else None
+    )
+
+# Oxirgi editni nusxalarga qo'llash
+async def apply_edit(msg: Message, bot):
+    """Edit qilingan postni barcha nusxalarga tarqatish"""
     try:
-        post_id = str(msg.message_id)
-        logging.info(f"✏️ Post edit aniqlandi: {post_id}")
-        
-        # Mapping dan postni topish
-        mapping = await load_mapping()
-        
-        if post_id not in mapping:
-            logging.warning(f"⚠️ Edit qilingan post mapping'da topilmadi: {post_id}")
-            return
-            
-        post_mapping = mapping[post_id]
-        logging.info(f"📋 Edit post mapping: {post_mapping}")
+        post_id = msg.message_id
+        logging.info(f"✏️ Edit tarqatilmoqda: {post_id}")
         
-        edit_count = 0
-        failed_count = 0
+        # Post qulfi - o'qish, tarqatish va fingerprint yozish orasida post o'zgarmaydi
+        async with mapping_store.locked(post_id):
+            # Mapping dan postni topish
+            post_mapping = await mapping_store.get(post_id)
         
-        # Post turini aniqlash va nusxalarni edit qilish
-        if isinstance(post_mapping, dict) and "reply_to" in post_mapping:
-            # Bu reply xabar - reply nusxalarini edit qilish
-            logging.info(f"📩 Reply xabar edit qilinmoqda: {post_id}")
-            targets = post_mapping.get("targets", {})
-            
-            for chat_id_str, target_msg_id in targets.items():
-                try:
-                    chat_id = int(chat_id_str)
-                    
-                    # Reply postni edit qilish
-                    if msg.text:
-                        # Faqat matn
-                        await bot.edit_message_text(
-                            chat_id=chat_id,
-                            message_id=target_msg_id,
-                            text=msg.text,
-                            entities=msg.entities
-                        )
-                    elif msg.photo:
-                        # Rasm + caption
-                        from aiogram.types import InputMediaPhoto
-                        media = InputMediaPhoto(
-                            media=msg.photo[-1].file_id,
-                            caption=msg.caption,
-                            caption_entities=msg.caption_entities
-                        )
-                        await bot.edit_message_media(
-                            chat_id=chat_id,
-                            message_id=target_msg_id,
-                            media=media
-                        )
-                    elif msg.video:
-                        # Video + caption
-                        from aiogram.types import InputMediaVideo
-                        media = InputMediaVideo(
-                            media=msg.video.file_id,
-                            caption=msg.caption,
-                            caption_entities=msg.caption_entities
-                        )
-                        await bot.edit_message_media(
-                            chat_id=chat_id,
-                            message_id=target_msg_id,
-                            media=media
-                        )
-                    elif msg.document:
-                        # Document + caption
-                        from aiogram.types import InputMediaDocument
-                        media = InputMediaDocument(
-                            media=msg.document.file_id,
-                            caption=msg.caption,
-                            caption_entities=msg.caption_entities
-                        )
-                        await bot.edit_message_media(
-                            chat_id=chat_id,
-                            message_id=target_msg_id,
-                            media=media
-                        )
-                    elif msg.caption:
-                        # Faqat caption
-                        await bot.edit_message_caption(
-                            chat_id=chat_id,
-                            message_id=target_msg_id,
-                            caption=msg.caption,
-                            caption_entities=msg.caption_entities
-                        )
-                    
-                    edit_count += 1
-                    logging.info(f"✅ Reply edit qilindi: {chat_id} → {target_msg_id}")
-                    
-                    # Rate limit uchun kichik kechikish
-                    await asyncio.sleep(0.2)
-                    
-                except Exception as e:
-                    failed_count += 1
-                    logging.error(f"❌ Reply edit qilishda xato {chat_id}: {e}")
-        else:
-            # Oddiy post - barcha nusxalarni edit qilish
-            channels_to_edit = {}
-            
-            # Eski yoki yangi format bo'yicha channels olish
-            if isinstance(post_mapping, dict) and "c" in post_mapping:
-                # Compressed format
-                channels_to_edit = post_mapping["c"]
+            if post_mapping is None:
+                logging.warning(f"⚠️ Edit qilingan post mapping'da topilmadi: {post_id}")
+                return
+
+            logging.info(f"📋 Edit post mapping: {post_mapping}")
+            copies = post_mapping.targets()
+
+            # Oldingi editlarning kutilayotgan qayta urinishlari endi eskirgan
+            for chat_id, copy_id in copies.items():
+                retry_scheduler.cancel(("edit", chat_id, copy_id))
+
+            # Fingerprint - hech narsa o'zgarmagan bo'lsa edit kerak emas
+            fingerprint = content_fingerprint(msg)
+            old_fingerprint = post_mapping.fingerprint
+            if fingerprint == old_fingerprint:
+                logging.info(f"⏭ Mazmun o'zgarmagan, edit o'tkazib yuborildi: {post_id}")
+                return
+
+            request = build_edit_request(msg, old_fingerprint)
+            if request is None:
+                logging.info(f"📷 Qo'llab-quvvatlanmagan media edit: {post_id}")
+                return
+
+            # Post yoki reply - nusxalar bir xil ko'rinishda
+            if post_mapping.is_reply:
+                logging.info(f"📩 Reply xabar edit qilinmoqda: {post_id}")
+
+            try:
+                result = await propagate_edit(bot, post_id, copies, request)
+            except asyncio.CancelledError:
+                # Nusxalarning bir qismi yangi mazmunda qolgan bo'lishi mumkin -
+                # keyingi edit fingerprint ga qaramay to'liq tarqatilsin
+                await mapping_store.set_fingerprint(post_id, None)
+                raise
+
+            # Hammasi muvaffaqiyatli bo'lsagina nusxalar shu fingerprint ga mos
+            await mapping_store.set_fingerprint(post_id, None if result.failed else fingerprint)
+            if result.ok:
+                logging.info(f"✅ Edit jarayoni tugadi: {len(result.ok)} ta muvaffaqiyatli, "
+                             f"{len(result.failed)} ta xato, {result.elapsed:.2f} s")
             else:
-                # Oddiy format
-                channels_to_edit = post_mapping
-            
-            for chat_id_str, target_msg_id in channels_to_edit.items():
-                if chat_id_str in ["_timestamp", "t"]:
-                    continue
-                    
-                try:
-                    chat_id = int(chat_id_str)
-                    
-                    # Postni edit qilish
-                    if msg.text:
-                        # Faqat matn
-                        await bot.edit_message_text(
-                            chat_id=chat_id,
-                            message_id=target_msg_id,
-                            text=msg.text,
-                            entities=msg.entities
-                        )
-                    elif msg.photo:
-                        # Rasm + caption
-                        from aiogram.types import InputMediaPhoto
-                        media = InputMediaPhoto(
-                            media=msg.photo[-1].file_id,  # Eng katta o'lcham
-                            caption=msg.caption,
-                            caption_entities=msg.caption_entities
-                        )
-                        await bot.edit_message_media(
-                            chat_id=chat_id,
-                            message_id=target_msg_id,
-                            media=media
-                        )
-                    elif msg.video:
-                        # Video + caption
-                        from aiogram.types import InputMediaVideo
-                        media = InputMediaVideo(
-                            media=msg.video.file_id,
-                            caption=msg.caption,
-                            caption_entities=msg.caption_entities
-                        )
-                        await bot.edit_message_media(
-                            chat_id=chat_id,
-                            message_id=target_msg_id,
-                            media=media
-                        )
-                    elif msg.document:
-                        # Document + caption
-                        from aiogram.types import InputMediaDocument
-                        media = InputMediaDocument(
-                            media=msg.document.file_id,
-                            caption=msg.caption,
-                            caption_entities=msg.caption_entities
-                        )
-                        await bot.edit_message_media(
-                            chat_id=chat_id,
-                            message_id=target_msg_id,
-                            media=media
-                        )
-                    elif msg.caption:
-                        # Faqat caption (fallback)
-                        await bot.edit_message_caption(
-                            chat_id=chat_id,
-                            message_id=target_msg_id,
-                            caption=msg.caption,
-                            caption_entities=msg.caption_entities
-                        )
-                    else:
-                        # Boshqa media turlari
-                        logging.info(f"📷 Qo'llab-quvvatlanmagan media edit: {chat_id} → {target_msg_id}")
-                        continue
-                    
-                    edit_count += 1
-                    logging.info(f"✅ Post edit qilindi: {chat_id} → {target_msg_id}")
-                    
-                    # Rate limit uchun kichik kechikish
-                    await asyncio.sleep(0.2)
-                    
-                except Exception as e:
-                    failed_count += 1
-                    logging.error(f"❌ Post edit qilishda xato {chat_id}: {e}")
-        
-        if edit_count > 0:
-            logging.info(f"✅ Edit jarayoni tugadi: {edit_count} ta muvaffaqiyatli, {failed_count} ta xato")
-        else:
-            logging.warning(f"⚠️ Hech qanday post edit qilinmadi: {post_id}")
+                logging.warning(f"⚠️ Hech qanday post edit qilinmadi: {post_id}")
             
     except Exception as e:
         logging.error(f"❌ EDIT POSTDA XATO: {e}")
@@ -768,23 +906,30 @@ async def handle_edit_post(msg: Message, bot):
         logging.error(traceback.format_exc())
 
 # Forward qilinganda tugma chiqarish - faqat adminlar
-@router.message(F.forward_from_chat.id == MAIN_CHANNEL_ID)
+# Asosiy kanaldan ham, nishon kanaldagi nusxadan ham forward qilish mumkin
+@router.message(F.forward_from_chat)
 async def handle_forward(msg: Message, bot):
     # Admin tekshiruvi
     if not await is_admin(msg.from_user.id, bot):
         return  # Admin bo'lmasa, delete tugmasi chiqmaydi
     
-    mapping = await load_mapping()
-    source_id = str(msg.forward_from_message_id)
+    if msg.forward_from_chat.id == MAIN_CHANNEL_ID:
+        source_id = msg.forward_from_message_id
+    else:
+        # Nusxa - teskari indeks orqali manba postni topish
+        source_id = await mapping_store.find_source(msg.forward_from_chat.id, msg.forward_from_message_id)
+        if source_id is None:
+            await msg.reply("❌ Bu xabar mapping'da topilmadi yoki allaqachon o'chirilgan.")
+            return
+        logging.info(f"🔎 Nusxa {msg.forward_from_chat.id} → {msg.forward_from_message_id} manbasi: {source_id}")
+    post_mapping = await mapping_store.get(source_id)
 
-    if source_id in mapping:
-        # Post mappingida mavjudligini tekshirish
-        post_mapping = mapping[source_id]
+    if post_mapping is not None:
         
         # Reply xabar ekanligini tekshirish
-        if isinstance(post_mapping, dict) and "reply_to" in post_mapping:
+        if post_mapping.is_reply:
             # Bu reply xabar
-            reply_info = f"\n📩 Bu reply xabar (javob: {post_mapping['reply_to']})"
+            reply_info = f"\n📩 Bu reply xabar (javob: {post_mapping.reply_to})"
         else:
             # Bu oddiy post
             reply_info = ""
@@ -799,54 +944,18 @@ async def handle_forward(msg: Message, bot):
 # Tugma bosilganda postni o'chirish (asosiy post + barcha nusxalar)
 @router.callback_query(F.data.startswith("delete:"))
 async def handle_delete_btn(callback: CallbackQuery, bot):
-    source_id = callback.data.split(":")[1]
-    mapping = await load_mapping()
+    source_id = int(callback.data.split(":")[1])
+    post_mapping = await mapping_store.get(source_id)
 
-    if source_id in mapping:
-        post_mapping = mapping[source_id]
-        deleted_count = 0
-        
+    if post_mapping is not None:
         # Reply xabar yoki oddiy post ekanligini tekshirish
-        if isinstance(post_mapping, dict) and "reply_to" in post_mapping:
-            # Bu reply xabar - "targets" ichidagi nusxalarni o'chirish
+        if post_mapping.is_reply:
             logging.info(f"🔄 Reply xabarni o'chirish: {source_id}")
-            targets = post_mapping.get("targets", {})
-            
-            for chat_id_str, msg_id in targets.items():
-                try:
-                    await bot.delete_message(int(chat_id_str), msg_id)
-                    deleted_count += 1
-                    logging.info(f"✅ Reply nusxasi o'chirildi: {chat_id_str} → {msg_id}")
-                except Exception as e:
-                    logging.error(f"❌ Reply nusxasini o'chirishda xato {chat_id_str}: {e}")
         else:
-            # Bu oddiy post - to'g'ridan-to'g'ri nusxalarni o'chirish
             logging.info(f"📝 Oddiy postni o'chirish: {source_id}")
-            
-            for chat_id_str, msg_id in post_mapping.items():
-                if chat_id_str in ["reply_to", "targets", "_timestamp"]:
-                    continue
-                try:
-                    await bot.delete_message(int(chat_id_str), msg_id)
-                    deleted_count += 1
-                    logging.info(f"✅ Post nusxasi o'chirildi: {chat_id_str} → {msg_id}")
-                except Exception as e:
-                    logging.error(f"❌ Post nusxasini o'chirishda xato {chat_id_str}: {e}")
-        
-        # Asosiy kanaldagi xabarni ham o'chirish
-        try:
-            await bot.delete_message(MAIN_CHANNEL_ID, int(source_id))
-            deleted_count += 1
-            logging.info(f"✅ Asosiy xabar o'chirildi: {source_id}")
-        except Exception as e:
-            logging.error(f"❌ Asosiy xabarni o'chirishda xato: {e}")
 
-        # Mapping'dan o'chirish
-        fresh_mapping = await load_mapping()
-        if source_id in fresh_mapping:
-            del fresh_mapping[source_id]
-            await save_mapping(fresh_mapping)
-            logging.info(f"✅ Mapping'dan o'chirildi: {source_id}")
+        # Asosiy xabar + barcha nusxalar - chat bo'yicha bulk o'chirish
+        deleted_count = await delete_posts_everywhere(bot, [source_id])
 
         if deleted_count > 1:
             await callback.message.edit_text(f"✅ Xabar va {deleted_count-1} ta nusxasi o'chirildi!")
@@ -1615,12 +1724,8 @@ async def admin_stats_menu(callback: CallbackQuery):
     """Statistika ko'rish"""
     try:
         # Mapping fayl hajmi
-        mapping_size = len(await load_mapping())
-        file_size = 0
-        try:
-            file_size = os.path.getsize(MAPPING_FILE) / 1024  # KB
-        except:
-            pass
+        mapping_size = await mapping_store.count()
+        file_size = await mapping_store.disk_size() / 1024  # KB
         
         # Modellar statistikasi
         config = await load_admin_config()
@@ -1636,7 +1741,8 @@ async def admin_stats_menu(callback: CallbackQuery):
         
         text = "📊 <b>Bot statistikasi</b>\n\n"
         text += f"🗂️ <b>Mapping:</b> {mapping_size} ta yozuv\n"
-        text += f"💾 <b>Fayl hajmi:</b> {file_size:.1f} KB\n\n"
+        text += f"💾 <b>Fayl hajmi:</b> {file_size:.1f} KB\n"
+        text += f"⏱ <b>Event loop bloklanishi:</b> {loop_monitor.summary()}\n\n"
         text += f"🤖 <b>Modellar:</b> {models_count} ta\n"
         text += f"🗺️ <b>Viloyatlar:</b> {regions_count} ta\n"
         text += f"📢 <b>Umumiy kanallar:</b> {always_count} ta\n\n"
@@ -1742,6 +1848,27 @@ async def cmd_status(msg: Message, bot):
 
     await msg.answer(report)
 
+# /routes komandasi - routing jadvalini ko'rish
+@router.message(Command("routes"))
+async def cmd_routes(msg: Message, bot):
+    """Routing jadvali: (model, viloyat) → kanallar"""
+    if not await is_admin(msg.from_user.id, bot):
+        return  # Javob bermaydi
+
+    routes = await get_routing_table()
+    config = await get_current_config()
+
+    text = f"🧭 <b>Routing jadvali</b> ({len(routes)} ta kombinatsiya):\n\n"
+    for line in routes.dump(config["channel_names"]):
+        line = f"• {line}\n"
+        if len(text) + len(line) > 4000:
+            # Telegram xabar limiti
+            await msg.answer(text)
+            text = ""
+        text += line
+
+    await msg.answer(text)
+
 # /del komandasi - yangi
 @router.message(Command("del"))
 async def cmd_delete_post(msg: Message, bot):
@@ -1756,52 +1883,18 @@ async def cmd_delete_post(msg: Message, bot):
         return
 
     try:
-        post_id = str(int(args[1]))  # Faqat raqam
+        post_id = int(args[1])  # Faqat raqam
     except ValueError:
         await msg.answer("❌ Post ID raqam bo'lishi kerak!")
         return
 
-    mapping = await load_mapping()
-    if post_id not in mapping:
+    post_mapping = await mapping_store.get(post_id)
+    if post_mapping is None:
         await msg.answer("❌ Bu post mapping'da topilmadi!")
         return
 
-    post_mapping = mapping[post_id]
-    deleted_count = 0
-
-    # 1️⃣ Asosiy kanaldagi postni o'chirish
-    try:
-        await bot.delete_message(MAIN_CHANNEL_ID, int(post_id))
-        deleted_count += 1
-    except Exception as e:
-        logging.error(f"❌ Asosiy postni o'chirishda xato: {e}")
-
-    # 2️⃣ Nusxalarni o'chirish
-    if isinstance(post_mapping, dict) and "reply_to" in post_mapping:
-        # Reply xabarlar
-        targets = post_mapping.get("targets", {})
-        for chat_id_str, msg_id in targets.items():
-            try:
-                await bot.delete_message(int(chat_id_str), msg_id)
-                deleted_count += 1
-            except Exception as e:
-                logging.error(f"❌ Reply nusxasini o'chirishda xato: {e}")
-    else:
-        # Oddiy postlar
-        for chat_id_str, msg_id in post_mapping.items():
-            if chat_id_str in ["reply_to", "targets", "_timestamp", "_forwarded", "t"]:
-                continue
-            try:
-                await bot.delete_message(int(chat_id_str), msg_id)
-                deleted_count += 1
-            except Exception as e:
-                logging.error(f"❌ Post nusxasini o'chirishda xato: {e}")
-
-    # 3️⃣ Mapping'dan o'chirish
-    fresh_mapping = await load_mapping()
-    if post_id in fresh_mapping:
-        del fresh_mapping[post_id]
-        await save_mapping(fresh_mapping)
+    # Asosiy post + nusxalar (chat bo'yicha bulk) va mapping'dan o'chirish
+    deleted_count = await delete_posts_everywhere(bot, [post_id])
 
     await msg.answer(f"✅ {deleted_count} ta xabar o'chirildi!")
 
@@ -0,0 +1,76 @@
+from collections import deque
+
+
+class KeywordMatcher:
+    """Aho-Corasick avtomat - barcha kalit so'zlarni matndan bir o'tishda topish
+
+    `groups` - {"model": {"nexia": ["nexia", "нексия"]}, "region": {...}}.
+    Har bir guruh uchun ro'yxatdagi tartib bo'yicha birinchi mos nom qaytariladi
+    (avvalgi `keyword.lower() in text.lower()` tekshiruvi bilan bir xil natija).
+    """
+
+    def __init__(self, groups, version=0):
+        self.version = version
+        self.groups = list(groups)
+        self._names = {group: list(items) for group, items in groups.items()}
+        self._goto = [{}]
+        self._fail = [0]
+        self._out = [[]]
+        for group, items in groups.items():
+            for rank, (name, keywords) in enumerate(items.items()):
+                for keyword in keywords:
+                    self._add(keyword.lower(), (group, rank))
+        self._build()
+
+    def _add(self, pattern, output):
+        node = 0
+        for char in pattern:
+            nxt = self._goto[node].get(char)
+            if nxt is None:
+                nxt = len(self._goto)
+                self._goto[node][char] = nxt
+                self._goto.append({})
+                self._fail.append(0)
+                self._out.append([])
+            node = nxt
+        self._out[node].append(output)
+
+    def _build(self):
+        # BFS - fail havolalari va chiqishlarni birlashtirish
+        queue = deque(self._goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for char, child in self._goto[node].items():
+                queue.append(child)
+                fail = self._fail[node]
+                while fail and char not in self._goto[fail]:
+                    fail = self._fail[fail]
+                target = self._goto[fail].get(char, 0)
+                self._fail[child] = target if target != child else 0
+                self._out[child] = self._out[child] + self._out[self._fail[child]]
+
+    def match(self, text):
+        """Matndan har bir guruh uchun topilgan nomni qaytarish: {"model": "nexia", "region": None}"""
+        best = {group: None for group in self.groups}
+        if not text:
+            return {group: None for group in self.groups}
+
+        def record(outputs):
+            for group, rank in outputs:
+                if best[group] is None or rank < best[group]:
+                    best[group] = rank
+
+        record(self._out[0])  # Bo'sh kalit so'z har qanday matnga mos
+        goto, fail, out = self._goto, self._fail, self._out
+        node = 0
+        for char in text.lower():
+            while node and char not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(char, 0)
+            if out[node]:
+                record(out[node])
+
+        return {
+            group: (self._names[group][rank] if rank is not None else None)
+            for group, rank in best.items()
+        }
@@ -0,0 +1,48 @@
+import logging
+import time
+import asyncio
+
+
+class LoopLagMonitor:
+    """Event loop bloklanishini o'lchash - har `interval` da uyg'onish kechikishi
+
+    Agar loop sinxron ish (katta JSON yozish va h.k.) bilan band bo'lsa,
+    `asyncio.sleep(interval)` kechikib qaytadi - ortiqcha vaqt bloklanish.
+    """
+
+    def __init__(self, interval=0.05, threshold=0.1):
+        self.interval = interval
+        self.threshold = threshold  # Shundan uzun bloklanish - "stall"
+        self.max_lag = 0.0
+        self.total_lag = 0.0
+        self.stalls = 0
+        self.samples = 0
+        self.started_at = None
+        self._task = None
+
+    def start(self):
+        if self._task is None or self._task.done():
+            self.started_at = time.monotonic()
+            self._task = asyncio.create_task(self._run())
+
+    async def _run(self):
+        while True:
+            expected = time.monotonic() + self.interval
+            await asyncio.sleep(self.interval)
+            lag = max(0.0, time.monotonic() - expected)
+            self.samples += 1
+            self.total_lag += lag
+            if lag > self.max_lag:
+                self.max_lag = lag
+            if lag >= self.threshold:
+                self.stalls += 1
+                logging.warning(f"🐢 Event loop {lag * 1000:.0f} ms bloklandi")
+
+    def summary(self):
+        """Statistika uchun qisqa matn"""
+        uptime = time.monotonic() - self.started_at if self.started_at else 0.0
+        return (
+            f"max {self.max_lag * 1000:.0f} ms, "
+            f"jami {self.total_lag:.2f} s / {uptime / 60:.0f} daq, "
+            f"{self.stalls} ta >{self.threshold * 1000:.0f} ms"
+        )
@@ -0,0 +1,376 @@
+import json
+import logging
+import mmap
+import os
+import struct
+import sys
+import time
+
+from mapping_store import (
+    BATCHED,
+    FSYNC,
+    MappingRecord,
+    MappingStore,
+    atomic_replace,
+    read_mapping_file,
+    replay_journal
+)
+
+MAGIC = b"PAMB"
+VERSION = 1
+NEVER = 2 ** 62  # Muddatsiz yozuvlar uchun eskirish kaliti
+
+# Fayl tuzilishi (little-endian, hammasi qat'iy uzunlikdagi yozuvlar):
+#   sarlavha
+#   yozuvlar   - source_id bo'yicha tartiblangan
+#   nusxalar   - (kanal, xabar) juftlari, yozuv pairs_off/pairs_len orqali
+#   teskari    - (kanal, xabar, source_id) tartiblangan - find_source
+#   bolalar    - (ota, bola) tartiblangan - thread
+#   eskirish   - (vaqt, source_id) tartiblangan - expire
+#   satrlar    - fingerprint lar (utf-8)
+HEADER = struct.Struct("<4sHHIIIQ")      # magic, versiya, zaxira, yozuvlar, juftlar, bolalar, satrlar hajmi
+RECORD = struct.Struct("<qqqIIHH")       # source_id, vaqt, reply_to (0 - yo'q), pairs_off, fp_off, pairs_len, fp_len
+PAIR = struct.Struct("<qq")              # kanal, xabar
+TARGET = struct.Struct("<qqq")           # kanal, xabar, source_id
+CHILD = struct.Struct("<qq")             # ota, bola
+EXPIRY = struct.Struct("<qq")            # eskirish vaqti, source_id
+
+
+def expiry_key(source_id, timestamp):
+    """Eskirish tartibi uchun vaqt (timestamp yo'q eski yozuvlar - MappingStore bilan bir xil taxmin)"""
+    if timestamp:
+        return timestamp
+    return 0 if source_id < 1000000 else NEVER
+
+
+def write_binary(path, items):
+    """(source_id, MappingRecord) lardan binary snapshot yozish - yozuvlar soni"""
+    items = sorted(items, key=lambda item: item[0])
+    records, pairs, targets, children, expiry = [], [], [], [], []
+    heap = bytearray()
+    for source_id, entry in items:
+        fingerprint = (entry.fingerprint or "").encode("utf-8")
+        records.append(RECORD.pack(
+            source_id, entry.timestamp, entry.reply_to or 0,
+            len(pairs), len(heap), len(entry), len(fingerprint)
+        ))
+        for chat_id, message_id in entry.targets().items():
+            pairs.append(PAIR.pack(chat_id, message_id))
+            targets.append((chat_id, message_id, source_id))
+        if entry.reply_to is not None:
+            children.append((entry.reply_to, source_id))
+        expiry.append((expiry_key(source_id, entry.timestamp), source_id))
+        heap += fingerprint
+
+    with open(path, "wb") as f:
+        f.write(HEADER.pack(MAGIC, VERSION, 0, len(records), len(pairs), len(children), len(heap)))
+        f.write(b"".join(records))
+        f.write(b"".join(pairs))
+        f.write(b"".join(TARGET.pack(*t) for t in sorted(targets)))
+        f.write(b"".join(CHILD.pack(*c) for c in sorted(children)))
+        f.write(b"".join(EXPIRY.pack(*e) for e in sorted(expiry)))
+        f.write(heap)
+    return len(records)
+
+
+class BinarySnapshot:
+    """mmap qilingan binary snapshot - yozuvlar kerak bo'lganda o'qiladi
+
+    Ochish faqat sarlavhani o'qiydi; har bir qidiruv - tartiblangan bo'limda
+    binary search (lug'at qurilmaydi).
+    """
+
+    def __init__(self, path, f, mm):
+        self.path = path
+        self._file = f
+        self._mm = mm
+        magic, version, _, self._count, pair_count, child_count, _ = HEADER.unpack_from(mm, 0)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f"Binary mapping fayl formati noto'g'ri: {path}")
+        self._records = HEADER.size
+        self._pairs = self._records + self._count * RECORD.size
+        self._targets = self._pairs + pair_count * PAIR.size
+        self._children = self._targets + pair_count * TARGET.size
+        self._expiry = self._children + child_count * CHILD.size
+        self._heap = self._expiry + self._count * EXPIRY.size
+        self._pair_count = pair_count
+        self._child_count = child_count
+
+    @classmethod
+    def open(cls, path):
+        """Faylni (yoki .backup ni) ochish - fayl yo'q bo'lsa None"""
+        for file_path in (path, f"{path}.backup"):
+            try:
+                f = open(file_path, "rb")
+            except FileNotFoundError:
+                continue
+            mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            return cls(file_path, f, mm)
+        return None
+
+    def close(self):
+        self._mm.close()
+        self._file.close()
+
+    def __len__(self):
+        return self._count
+
+    def _lower_bound(self, offset, count, fmt, key):
+        # Tartiblangan bo'limda key dan kichik bo'lmagan birinchi yozuv indeksi
+        lo, hi = 0, count
+        width = len(key)
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if fmt.unpack_from(self._mm, offset + mid * fmt.size)[:width] < key:
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo
+
+    def _record_at(self, index):
+        source_id, timestamp, reply_to, pairs_off, fp_off, pairs_len, fp_len = RECORD.unpack_from(
+            self._mm, self._records + index * RECORD.size
+        )
+        start = self._pairs + pairs_off * PAIR.size
+        pairs = PAIR.iter_unpack(self._mm[start:start + pairs_len * PAIR.size])
+        fingerprint = self._mm[self._heap + fp_off:self._heap + fp_off + fp_len].decode("utf-8")
+        return source_id, MappingRecord(pairs, timestamp, reply_to or None, fingerprint)
+
+    def _index_of(self, source_id):
+        index = self._lower_bound(self._records, self._count, RECORD, (source_id,))
+        if index < self._count and RECORD.unpack_from(self._mm, self._records + index * RECORD.size)[0] == source_id:
+            return index
+        return None
+
+    def get(self, source_id):
+        """Bitta yozuv (yo'q bo'lsa None)"""
+        index = self._index_of(source_id)
+        return self._record_at(index)[1] if index is not None else None
+
+    def records(self):
+        """Barcha (source_id, MappingRecord) - tartib bo'yicha"""
+        for index in range(self._count):
+            yield self._record_at(index)
+
+    def find_source(self, chat_id, message_id):
+        index = self._lower_bound(self._targets, self._pair_count, TARGET, (chat_id, message_id))
+        if index < self._pair_count:
+            found_chat, found_message, source_id = TARGET.unpack_from(self._mm, self._targets + index * TARGET.size)
+            if (found_chat, found_message) == (chat_id, message_id):
+                return source_id
+        return None
+
+    def children(self, parent_id):
+        index = self._lower_bound(self._children, self._child_count, CHILD, (parent_id,))
+        result = []
+        while index < self._child_count:
+            parent, child = CHILD.unpack_from(self._mm, self._children + index * CHILD.size)
+            if parent != parent_id:
+                break
+            result.append(child)
+            index += 1
+        return result
+
+    def expired(self, cutoff_time):
+        """cutoff_time dan eski yozuvlar - faqat eskirganlar o'qiladi"""
+        end = self._lower_bound(self._expiry, self._count, EXPIRY, (cutoff_time,))
+        return [
+            EXPIRY.unpack_from(self._mm, self._expiry + index * EXPIRY.size)[1]
+            for index in range(end)
+        ]
+
+
+class _Overlay:
+    """replay_journal uchun lug'at o'rnini bosuvchi - o'zgarishlar store overlay iga"""
+
+    def __init__(self, store):
+        self._store = store
+
+    def __setitem__(self, key, entry):
+        self._store._set(key, entry)
+
+    def pop(self, key, default=None):
+        entry = self._store._pop(key)
+        return default if entry is None else entry
+
+
+class BinaryMappingStore(MappingStore):
+    """Binary snapshot (mmap) + xotiradagi o'zgarishlar qatlami
+
+    Ishga tushishda snapshot to'liq o'qilmaydi - yozuvlar so'ralganda mmap
+    dan olinadi. Journal dagi va yangi o'zgarishlar `_data` da (overlay),
+    snapshot dagi o'chirilganlar `_deleted` da turadi. Snapshot paytida
+    ikkalasi yangi binary faylga birlashtiriladi.
+    """
+
+    def __init__(self, path="mapping.bin", legacy_path=None, snapshot_every=1000, commit_window=0.05,
+                 durability=BATCHED):
+        super().__init__(path, snapshot_every=snapshot_every, commit_window=commit_window,
+                         durability=durability)
+        self.legacy_path = legacy_path
+        self._base = None     # BinarySnapshot
+        self._deleted = set()  # O'chirilgan kalitlar - snapshot dagi eski nusxasini yashiradi
+        self._live = 0
+
+    def __len__(self):
+        return self._live
+
+    # Yuklash
+    def _load_files(self):
+        # Writer thread - faqat ishga tushishda
+        # Faqat birinchi ishga tushishda ko'chirish - .backup bo'lsa, snapshot almashtirish
+        # paytida to'xtagan, undan (BinarySnapshot.open) davom etiladi
+        has_snapshot = os.path.exists(self.path) or os.path.exists(f"{self.path}.backup")
+        if not has_snapshot and self.legacy_path and os.path.exists(self.legacy_path):
+            count = json_to_binary(self.legacy_path, self.path)
+            logging.info(f"🔄 {self.legacy_path} → {self.path}: {count} ta yozuv")
+        self._base = BinarySnapshot.open(self.path)
+        self._data = {}
+        self._deleted = set()
+        self._live = len(self._base) if self._base is not None else 0
+        self._rebuild_indexes()
+        replayed = replay_journal(self.journal_path, _Overlay(self), repair=True)
+        self._journal_records = replayed
+        self._journal = open(self.journal_path, "a", encoding="utf-8")
+        return replayed, 0
+
+    # O'qish - avval overlay, keyin snapshot
+    def _lookup(self, key):
+        entry = self._data.get(key)
+        if entry is None and self._base is not None and key not in self._deleted:
+            entry = self._base.get(key)
+        return entry
+
+    def _is_live(self, key):
+        return self._lookup(key) is not None
+
+    def _child_ids(self, key):
+        children = set(self._children.get(key, ()))
+        if self._base is not None:
+            for child in self._base.children(key):
+                # Overlay dagi yozuv ustun - u hali bola bo'lsa _children da bor
+                if child not in self._deleted and child not in self._data:
+                    children.add(child)
+        return children
+
+    async def find_source(self, chat_id, message_id):
+        """Nusxadan manba post kalitini topish (topilmasa None)"""
+        pair = (int(chat_id), int(message_id))
+        source_id = self._sources.get(pair)
+        if source_id is None and self._base is not None:
+            source_id = self._base.find_source(*pair)
+            if source_id in self._deleted or source_id in self._data:
+                return None  # O'chirilgan yoki yangilangan (yangisi bo'lsa _sources da bo'lardi)
+        return source_id
+
+    # Overlay
+    def _set(self, key, entry):
+        if not self._is_live(key):
+            self._live += 1
+        super()._set(key, entry)
+
+    def _pop(self, key):
+        entry = super()._pop(key)
+        if entry is None and self._base is not None and key not in self._deleted:
+            entry = self._base.get(key)
+        if entry is not None:
+            self._live -= 1
+            # Fondagi snapshot overlay dagi yozuvni ham yangi faylga olgan bo'lishi mumkin
+            self._deleted.add(key)
+        return entry
+
+    async def expire(self, cutoff_time):
+        """Snapshot dagi eskirganlar (eskirish bo'limidan) + overlay dagilar"""
+        expired = 0
+        if self._base is not None:
+            old_entries = [
+                key for key in self._base.expired(cutoff_time)
+                if key not in self._deleted and key not in self._data
+            ]
+            expired = await self.delete_many(old_entries)
+        return expired + await super().expire(cutoff_time)
+
+    # Snapshot
+    async def snapshot(self):
+        """Snapshot + overlay ni yangi binary faylga birlashtirish (writer thread da)"""
+        async with self._lock:
+            overlay = dict(self._data)
+            deleted = set(self._deleted)
+            self._journal_records = 0
+            pending = self._run(self._write_snapshot, self._base, overlay, deleted)
+        try:
+            new_base, elapsed = await pending
+        except Exception as e:
+            logging.error(f"❌ Mapping snapshot yozishda xato: {e}")
+            return
+        async with self._lock:
+            # Snapshot ga tushgan o'zgarishlarni overlay dan olib tashlash
+            self._base = new_base
+            for key in deleted:
+                # Snapshot dan keyin o'chirilgan overlay yozuvi - yangi faylda bor, belgi qoladi
+                if key not in overlay or key in self._data:
+                    self._deleted.discard(key)
+            for key, entry in overlay.items():
+                if self._data.get(key) is entry:
+                    MappingStore._pop(self, key)
+        logging.info(f"💾 Binary mapping snapshot yozildi: {len(self)} ta yozuv ({elapsed:.2f} s, fonda)")
+
+    def _write_snapshot(self, base, overlay, deleted):
+        # Writer thread
+        start = time.monotonic()
+
+        def merged():
+            if base is not None:
+                for key, entry in base.records():
+                    if key not in overlay and key not in deleted:
+                        yield key, entry
+            yield from overlay.items()
+
+        temp_file = f"{self.path}.tmp"
+        write_binary(temp_file, merged())
+        atomic_replace(temp_file, self.path, fsync=self.durability == FSYNC)
+
+        # Journal endi snapshot ichida - tozalash
+        if self._journal is not None:
+            self._journal.close()
+        self._journal = open(self.journal_path, "w", encoding="utf-8")
+        # Eski mmap ni yopmaymiz - navbatdagi boshqa snapshot hali o'qishi mumkin
+        return BinarySnapshot.open(self.path), time.monotonic() - start
+
+
+# JSON ↔ binary konvertorlar
+def json_to_binary(json_path, binary_path):
+    """mapping.json (+ journal) → binary snapshot - yozuvlar soni"""
+    data, _ = read_mapping_file(json_path)
+    replay_journal(f"{json_path}.journal", data)
+    temp_file = f"{binary_path}.tmp"
+    count = write_binary(temp_file, data.items())
+    os.replace(temp_file, binary_path)
+    return count
+
+
+def binary_to_json(binary_path, json_path):
+    """Binary snapshot → siqilgan mapping.json - yozuvlar soni"""
+    snapshot = BinarySnapshot.open(binary_path)
+    if snapshot is None:
+        raise FileNotFoundError(binary_path)
+    try:
+        compressed = {str(key): entry.to_json() for key, entry in snapshot.records()}
+    finally:
+        snapshot.close()
+    temp_file = f"{json_path}.tmp"
+    with open(temp_file, "w", encoding="utf-8") as f:
+        json.dump(compressed, f, ensure_ascii=False, separators=(',', ':'))
+    os.replace(temp_file, json_path)
+    return len(compressed)
+
+
+if __name__ == "__main__":
+    # python mapping_binary.py to-binary mapping.json mapping.bin
+    # python mapping_binary.py to-json mapping.bin mapping.json
+    if len(sys.argv) != 4 or sys.argv[1] not in ("to-binary", "to-json"):
+        print("Foydalanish: python mapping_binary.py to-binary|to-json <manba> <natija>")
+        sys.exit(1)
+    command, source, target = sys.argv[1:]
+    converter = json_to_binary if command == "to-binary" else binary_to_json
+    print(f"✅ {converter(source, target)} ta yozuv: {source} → {target}")
@@ -0,0 +1,234 @@
+import calendar
+import logging
+import os
+import time
+
+from mapping_store import (
+    BATCHED,
+    DAY,
+    FSYNC,
+    MappingStore,
+    atomic_replace,
+    files_size,
+    journal_line,
+    read_mapping_file,
+    replay_journal
+)
+
+LEGACY_PARTITION = "legacy"  # Timestamp siz eski yozuvlar (muddatsiz)
+MIGRATED_MARKER = ".migrated"  # mapping.json dan bir martalik ko'chirish bajarilgan
+
+
+def partition_name(day):
+    """Kun raqami → partition nomi (YYYY-MM-DD yoki legacy)"""
+    if day is None:
+        return LEGACY_PARTITION
+    return time.strftime("%Y-%m-%d", time.gmtime(day * DAY))
+
+
+def partition_day(name):
+    """Partition nomi → kun raqami (noto'g'ri nom bo'lsa ValueError)"""
+    if name == LEGACY_PARTITION:
+        return None
+    return calendar.timegm(time.strptime(name, "%Y-%m-%d")) // DAY
+
+
+class PartitionedMappingStore(MappingStore):
+    """Kunlik partition larga bo'lingan mapping - har bir kun alohida fayl
+
+    Har bir yozuv o'z kuni (`_timestamp`) faylida turadi: `mapping.d/2024-05-01.jsonl`.
+    Fayl - journal formatidagi qatorlar, yangi postlar faqat bugungi faylga
+    yoziladi. Eskirgan kunlar fayli shunchaki o'chiriladi, snapshot esa faqat
+    o'zgargan (odatda bugungi) partition ni qayta yozadi.
+    """
+
+    def __init__(self, directory="mapping.d", legacy_path=None, snapshot_every=1000, commit_window=0.05,
+                 durability=BATCHED):
+        super().__init__(directory, snapshot_every=snapshot_every, commit_window=commit_window,
+                         durability=durability)
+        self.legacy_path = legacy_path
+        self._files = {}  # {kun: ochiq fayl}
+        self._dirty = {}  # {kun: oxirgi snapshot dan beri yozuvlar soni}
+        self._cutoff_day = None  # Bundan eski partition lar o'chirilgan
+
+    def _partition_path(self, day):
+        return os.path.join(self.path, f"{partition_name(day)}.jsonl")
+
+    def _partitions(self):
+        """Diskdagi partition lar: {kun: fayl yo'li} (writer thread)"""
+        partitions = {}
+        file_names = set(os.listdir(self.path))
+        for file_name in sorted(file_names):
+            if file_name.endswith(".jsonl.backup") and file_name[:-len(".backup")] not in file_names:
+                # Qayta yozish paytida to'xtagan - oldingi versiyadan foydalanish
+                file_name = file_name[:-len(".backup")]
+                path = os.path.join(self.path, f"{file_name}.backup")
+            elif file_name.endswith(".jsonl"):
+                path = os.path.join(self.path, file_name)
+            else:
+                continue
+            try:
+                partitions[partition_day(file_name[:-len(".jsonl")])] = path
+            except ValueError:
+                logging.warning(f"⚠️ Noma'lum partition fayl o'tkazib yuborildi: {file_name}")
+        return partitions
+
+    def _disk_size(self):
+        # Writer thread - barcha partition fayllar yig'indisi
+        return files_size(self._partitions().values())
+
+    # Yuklash
+    async def load(self):
+        """Barcha partition larni xotiraga yuklash, kerak bo'lsa mapping.json dan ko'chirish"""
+        async with self._lock:
+            await self._run(self._load_files)
+            logging.info(f"💾 Mapping yuklandi: {len(self._data)} ta yozuv, {len(self._buckets)} ta partition ({self.path})")
+            return len(self._data)
+
+    def _load_files(self):
+        # Writer thread - faqat ishga tushishda
+        os.makedirs(self.path, exist_ok=True)
+        partitions = self._partitions()
+        for day, file_path in partitions.items():
+            if file_path.endswith(".backup"):
+                # Qayta yozish paytida to'xtagan - backup ni joyiga qaytarish, aks holda
+                # yangi yozuvlar bo'sh fayl ochib, backup keyingi safar e'tiborsiz qoladi
+                partitions[day] = self._partition_path(day)
+                os.replace(file_path, partitions[day])
+                logging.warning(f"♻️ Partition backup dan tiklandi: {os.path.basename(partitions[day])}")
+        self._data = {}
+        self._dirty = {}
+        marker = os.path.join(self.path, MIGRATED_MARKER)
+        migrate = not os.path.exists(marker) and not partitions
+        if migrate and self.legacy_path and os.path.exists(self.legacy_path):
+            self._migrate_json()
+        else:
+            # Eski kunlar avval - keyingi yozuvlar ustun
+            for day in sorted(partitions, key=lambda d: -1 if d is None else d):
+                self._dirty[day] = replay_journal(partitions[day], self._data, repair=True)
+        if not os.path.exists(marker):
+            # Hamma partition eskirib o'chsa ham mapping.json qayta ko'chirilmaydi
+            open(marker, "w").close()
+        self._rebuild_indexes()
+        # Faqat eskirgan (ustidan yozilgan) qatorlar snapshot ni talab qiladi
+        self._dirty = {
+            day: max(0, records - len(self._buckets.get(day, ())))
+            for day, records in self._dirty.items()
+        }
+        self._journal_records = sum(self._dirty.values())
+
+    def _migrate_json(self):
+        self._data, _ = read_mapping_file(self.legacy_path)
+        replay_journal(f"{self.legacy_path}.journal", self._data)
+        self._rebuild_indexes()
+        for day, keys in self._buckets.items():
+            self._write_partition(day, [(key, self._data[key]) for key in keys])
+        logging.info(f"🔄 {self.legacy_path} → {self.path}: {len(self._data)} ta yozuv, {len(self._buckets)} ta partition")
+
+    # Yozish
+    def _append(self, day, record):
+        self._dirty[day] = self._dirty.get(day, 0) + 1
+        return self._enqueue((day, journal_line(record)))
+
+    def _write_journal(self, record):
+        # put yozuvlari - yozuv kuni partition iga
+        key = record["k"]
+        return self._append(self._entry_day(key, self._data[key]), record)
+
+    def _write_batch(self, batch):
+        # Writer thread - har bir partition ga bitta write
+        lines = {}
+        for day, line in batch:
+            if day is not None and self._cutoff_day is not None and day < self._cutoff_day:
+                continue  # Partition allaqachon o'chirilgan - qayta yaratmaslik
+            lines.setdefault(day, []).append(line)
+        for day, day_lines in lines.items():
+            f = self._files.get(day)
+            if f is None:
+                f = self._files[day] = open(self._partition_path(day), "a", encoding="utf-8")
+            f.write("".join(day_lines))
+            self._sync(f)
+
+    async def delete_many(self, source_ids):
+        """Bir nechta yozuvni o'chirish - har bir partition ga bitta journal yozuvi"""
+        removed = {}
+        for key in map(int, source_ids):
+            entry = self._pop(key)
+            if entry is not None:
+                removed.setdefault(self._entry_day(key, entry), []).append(key)
+        for day, keys in removed.items():
+            commit = self._append(day, {"op": "del", "k": keys})
+        if removed:
+            await self._committed(commit)
+        return sum(len(keys) for keys in removed.values())
+
+    async def expire(self, cutoff_time):
+        """Eskirgan kunlar partition fayllarini o'chirish - fayl ichi o'qilmaydi"""
+        cutoff_day = cutoff_time // DAY
+        expired = 0
+        async with self._lock:
+            self._cutoff_day = cutoff_day
+            for day in [d for d in self._buckets if d is not None and d < cutoff_day]:
+                keys = list(self._buckets[day])
+                for key in keys:
+                    self._pop(key)
+                expired += len(keys)
+            for day in [d for d in self._dirty if d is not None and d < cutoff_day]:
+                self._journal_records -= self._dirty.pop(day)
+            pending = self._run(self._remove_partitions, cutoff_day)
+        await pending
+        # Chegara kuni - oddiy o'chirish (del yozuvi bilan)
+        return expired + await super().expire(cutoff_time)
+
+    def _remove_partitions(self, cutoff_day):
+        # Writer thread
+        for day, file_path in self._partitions().items():
+            if day is not None and day < cutoff_day:
+                self._close_partition(day)
+                os.remove(file_path)
+                if os.path.exists(f"{file_path}.backup"):
+                    os.remove(f"{file_path}.backup")
+                logging.info(f"🗑 Partition o'chirildi: {os.path.basename(file_path)}")
+
+    # Snapshot
+    def _close_partition(self, day):
+        f = self._files.pop(day, None)
+        if f is not None:
+            f.close()
+
+    def _write_partition(self, day, entries):
+        """Bitta partition ni [(kalit, yozuv), ...] dan qayta yozish (atomic, writer thread)"""
+        file_path = self._partition_path(day)
+        self._close_partition(day)
+        temp_file = f"{file_path}.tmp"
+        with open(temp_file, "w", encoding="utf-8") as f:
+            for key, entry in entries:
+                f.write(journal_line({"op": "put", "k": key, "v": entry.to_json()}))
+        atomic_replace(temp_file, file_path, fsync=self.durability == FSYNC)
+
+    def _write_partitions(self, partitions):
+        # Writer thread
+        for day, entries in partitions.items():
+            self._write_partition(day, entries)
+
+    async def snapshot(self):
+        """Faqat o'zgargan partition larni qayta yozish (eski journal qatorlarini tashlash)"""
+        async with self._lock:
+            changed = {
+                day: [(key, self._data[key]) for key in self._buckets.get(day, ())]
+                for day, records in self._dirty.items() if records
+            }
+            for day in changed:
+                self._journal_records -= self._dirty.pop(day)
+            pending = self._run(self._write_partitions, changed)
+        try:
+            await pending
+            if changed:
+                logging.info(f"💾 Mapping snapshot: {len(changed)} ta partition qayta yozildi (fonda)")
+        except Exception as e:
+            logging.error(f"❌ Mapping snapshot yozishda xato: {e}")
+
+    def _close_files(self):
+        # Writer thread
+        for day in list(self._files):
+            self._close_partition(day)
@@ -0,0 +1,244 @@
+import logging
+import os
+import sqlite3
+import time
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+
+from mapping_store import read_mapping_file, replay_journal, files_size, KeyLocks, MappingRecord, MEMORY, BATCHED, FSYNC
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS copies (
+    source_id  INTEGER NOT NULL,
+    chat_id    INTEGER NOT NULL,
+    message_id INTEGER NOT NULL,
+    t          INTEGER NOT NULL,
+    reply_to   INTEGER,
+    fp         TEXT,
+    PRIMARY KEY (source_id, chat_id)
+);
+CREATE INDEX IF NOT EXISTS idx_copies_t ON copies (t);
+CREATE INDEX IF NOT EXISTS idx_copies_reply_to ON copies (reply_to);
+CREATE INDEX IF NOT EXISTS idx_copies_target ON copies (chat_id, message_id);
+"""
+
+# Ishonchlilik darajasi → SQLite synchronous rejimi
+SYNCHRONOUS = {MEMORY: "OFF", BATCHED: "NORMAL", FSYNC: "FULL"}
+
+# PRAGMA user_version - mapping.json dan bir martalik ko'chirish bajarilgan
+MIGRATED = 1
+
+INSERT_ROW = "INSERT INTO copies (source_id, chat_id, message_id, t, reply_to, fp) VALUES (?, ?, ?, ?, ?, ?)"
+
+
+class SqliteMappingStore:
+    """SQLite mapping backend - har bir nusxa alohida qator (source → chat, message)
+
+    Barcha so'rovlar bitta fon thread da bajariladi, event loop bloklanmaydi.
+    """
+
+    def __init__(self, path="mapping.db", legacy_path=None, durability=BATCHED):
+        self.path = path
+        self.legacy_path = legacy_path
+        self.durability = durability
+        self._conn = None
+        self._key_locks = KeyLocks()
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="mapping-sqlite")
+
+    async def _run(self, func, *args):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, func, *args)
+
+    def locked(self, *source_ids):
+        """Postlar qulfi - MappingStore.locked bilan bir xil"""
+        return self._key_locks.hold(*map(int, source_ids))
+
+    # Yuklash
+    async def load(self):
+        """Bazani ochish, kerak bo'lsa mapping.json dan bir martalik ko'chirish"""
+        count = await self._run(self._open)
+        logging.info(f"💾 SQLite mapping ochildi: {count} ta yozuv ({self.path})")
+        return count
+
+    def _open(self):
+        self._conn = sqlite3.connect(self.path)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(f"PRAGMA synchronous={SYNCHRONOUS[self.durability]}")
+        self._conn.executescript(SCHEMA)
+        columns = [row[1] for row in self._conn.execute("PRAGMA table_info(copies)")]
+        if "fp" not in columns:
+            # Eski baza - fingerprint ustunini qo'shish
+            self._conn.execute("ALTER TABLE copies ADD COLUMN fp TEXT")
+        if self._conn.execute("PRAGMA user_version").fetchone()[0] < MIGRATED:
+            # Faqat bir marta - keyin jadval bo'shab qolsa ham mapping.json qayta o'qilmaydi
+            if self._count() == 0 and self.legacy_path and os.path.exists(self.legacy_path):
+                self._migrate_json()
+            self._conn.execute(f"PRAGMA user_version = {MIGRATED}")
+        return self._count()
+
+    def _migrate_json(self):
+        data, _ = read_mapping_file(self.legacy_path)
+        replay_journal(f"{self.legacy_path}.journal", data)
+        current_time = int(time.time())
+        rows = []
+        for source_id, entry in data.items():
+            timestamp = entry.timestamp
+            if not timestamp:
+                # Eski format - Telegram message ID asosida taxmin
+                timestamp = 0 if source_id < 1000000 else current_time
+            for chat_id, message_id in entry.targets().items():
+                rows.append((source_id, chat_id, message_id, timestamp, entry.reply_to, entry.fingerprint))
+        with self._conn:
+            self._conn.executemany(INSERT_ROW.replace("INSERT", "INSERT OR REPLACE"), rows)
+        logging.info(f"🔄 mapping.json → SQLite: {len(data)} ta yozuv ko'chirildi")
+
+    def _count(self):
+        return self._conn.execute("SELECT COUNT(DISTINCT source_id) FROM copies").fetchone()[0]
+
+    # O'qish
+    async def get(self, source_id):
+        """Bitta yozuvni olish - MappingRecord (yo'q bo'lsa None)"""
+        return await self._run(self._get, int(source_id))
+
+    def _get(self, source_id):
+        rows = self._conn.execute(
+            "SELECT chat_id, message_id, t, reply_to, fp FROM copies WHERE source_id = ?",
+            (source_id,)
+        ).fetchall()
+        if not rows:
+            return None
+        timestamp, reply_to, fingerprint = rows[0][2], rows[0][3], rows[0][4]
+        return MappingRecord([(row[0], row[1]) for row in rows], timestamp, reply_to, fingerprint)
+
+    async def count(self):
+        return await self._run(self._count)
+
+    async def disk_size(self):
+        """Diskdagi baza hajmi (bayt) - WAL bilan"""
+        return files_size((self.path, f"{self.path}-wal"))
+
+    async def find_source(self, chat_id, message_id):
+        """Nusxadan manba post kalitini topish (topilmasa None)"""
+        return await self._run(self._find_source, int(chat_id), int(message_id))
+
+    def _find_source(self, chat_id, message_id):
+        row = self._conn.execute(
+            "SELECT source_id FROM copies WHERE chat_id = ? AND message_id = ? LIMIT 1",
+            (chat_id, message_id)
+        ).fetchone()
+        return row[0] if row is not None else None
+
+    async def thread(self, source_id):
+        """Post va uning barcha javoblari (ichma-ich ham) kalitlari - post birinchi"""
+        return await self._run(self._thread, int(source_id))
+
+    def _thread(self, source_id):
+        # idx_copies_reply_to indeksi bo'yicha rekursiv yurish
+        rows = self._conn.execute(
+            """
+            WITH RECURSIVE thread(id) AS (
+                SELECT ?
+                UNION
+                SELECT DISTINCT copies.source_id FROM copies JOIN thread ON copies.reply_to = thread.id
+            )
+            SELECT id FROM thread
+            """,
+            (source_id,)
+        ).fetchall()
+        return [row[0] for row in rows]
+
+    # Yozish
+    async def put(self, source_id, entry):
+        """Yozuvni (MappingRecord) qo'shish/yangilash - bitta tranzaksiya"""
+        if not isinstance(entry, MappingRecord):
+            entry = MappingRecord.from_json(entry)
+        async with self.locked(source_id):
+            await self._run(self._put, int(source_id), entry)
+
+    def _put(self, source_id, entry):
+        timestamp = entry.timestamp or int(time.time())
+        rows = [
+            (source_id, chat_id, message_id, timestamp, entry.reply_to, entry.fingerprint)
+            for chat_id, message_id in entry.targets().items()
+        ]
+        with self._conn:
+            self._conn.execute("DELETE FROM copies WHERE source_id = ?", (source_id,))
+            self._conn.executemany(INSERT_ROW, rows)
+
+    async def add_target(self, source_id, chat_id, message_id, reply_to=None):
+        """Yozuvga bitta nusxa qo'shish (masalan, qayta urinishda yuborilgandan keyin)"""
+        async with self.locked(source_id):
+            await self._run(self._add_target, int(source_id), int(chat_id), message_id, reply_to)
+
+    def _add_target(self, source_id, chat_id, message_id, reply_to):
+        row = self._conn.execute(
+            "SELECT t, reply_to, fp FROM copies WHERE source_id = ? LIMIT 1", (source_id,)
+        ).fetchone()
+        if row is not None:
+            timestamp, reply_to, fingerprint = row
+        else:
+            timestamp = int(time.time())
+            reply_to = int(reply_to) if reply_to is not None else None
+            fingerprint = None
+        with self._conn:
+            self._conn.execute(
+                INSERT_ROW.replace("INSERT", "INSERT OR REPLACE"),
+                (source_id, chat_id, message_id, timestamp, reply_to, fingerprint)
+            )
+
+    async def set_fingerprint(self, source_id, fingerprint):
+        """Manba post fingerprint ini yangilash (edit dan keyin)"""
+        async with self.locked(source_id):
+            await self._run(self._set_fingerprint, int(source_id), fingerprint)
+
+    def _set_fingerprint(self, source_id, fingerprint):
+        with self._conn:
+            self._conn.execute("UPDATE copies SET fp = ? WHERE source_id = ?", (fingerprint, source_id))
+
+    async def delete(self, source_id):
+        """Yozuvni o'chirish - mavjud bo'lsa True"""
+        return await self.delete_many([source_id]) > 0
+
+    async def delete_many(self, source_ids):
+        """Bir nechta yozuvni o'chirish - o'chirilganlar soni"""
+        return await self._run(self._delete_many, [int(s) for s in source_ids])
+
+    def _delete_many(self, source_ids):
+        removed = 0
+        with self._conn:
+            for source_id in source_ids:
+                cur = self._conn.execute("DELETE FROM copies WHERE source_id = ?", (source_id,))
+                if cur.rowcount:
+                    removed += 1
+        return removed
+
+    async def expire(self, cutoff_time):
+        """cutoff_time dan eski yozuvlarni bitta DELETE bilan o'chirish"""
+        return await self._run(self._expire, cutoff_time)
+
+    def _expire(self, cutoff_time):
+        with self._conn:
+            expired = self._conn.execute(
+                "SELECT COUNT(DISTINCT source_id) FROM copies WHERE t < ?", (cutoff_time,)
+            ).fetchone()[0]
+            self._conn.execute("DELETE FROM copies WHERE t < ?", (cutoff_time,))
+        return expired
+
+    async def snapshot(self):
+        """WAL ni asosiy bazaga yig'ish"""
+        await self._run(self._checkpoint)
+
+    def _checkpoint(self):
+        self._conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+
+    async def close(self):
+        """Bazani yopish"""
+        if self._conn is None:
+            return
+        await self._run(self._close)
+        self._executor.shutdown(wait=True)
+
+    def _close(self):
+        self._checkpoint()
+        self._conn.close()
+        self._conn = None
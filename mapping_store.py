@@ -0,0 +1,641 @@
+import json
+import logging
+import os
+import time
+import zlib
+import asyncio
+import contextlib
+from array import array
+from concurrent.futures import ThreadPoolExecutor
+
+MAPPING_FILE = "mapping.json"
+DAY = 24 * 60 * 60  # Eskirish savatlari kengligi (sekund)
+
+# Saqlash ishonchliligi darajalari
+MEMORY = "memory"    # Faqat xotira - diskka faqat snapshot (har N o'zgarish va to'xtashda)
+BATCHED = "batched"  # Group commit - batch OS ga yoziladi (bot yiqilsa yo'qolmaydi)
+FSYNC = "fsync"      # Group commit + fsync - server o'chsa ham yo'qolmaydi
+DURABILITY_LEVELS = (MEMORY, BATCHED, FSYNC)
+
+# Eski kengaytirilgan formatdagi xizmat kalitlari (kanal ID emas)
+LEGACY_SERVICE_KEYS = ("reply_to", "targets", "_timestamp", "_forwarded", "_fp", "t")
+
+
+class MappingRecord:
+    """Bitta mapping yozuvi - manba post (yoki reply) va uning nusxalari
+
+    Nusxalar `array('q')` da juft-juft turadi: [kanal, xabar, kanal, xabar, ...],
+    barcha ID lar int. Yozuv o'zgarmas - with_* yangi yozuv qaytaradi.
+    """
+
+    __slots__ = ("pairs", "timestamp", "reply_to", "fingerprint")
+
+    def __init__(self, targets=(), timestamp=0, reply_to=None, fingerprint=None):
+        if isinstance(targets, dict):
+            targets = targets.items()
+        self.pairs = array("q")
+        for chat_id, message_id in targets:
+            self.pairs.append(int(chat_id))
+            self.pairs.append(int(message_id))
+        self.timestamp = int(timestamp or 0)
+        self.reply_to = int(reply_to) if reply_to is not None else None
+        self.fingerprint = fingerprint or None
+
+    @property
+    def is_reply(self):
+        return self.reply_to is not None
+
+    def targets(self):
+        """{kanal_id: xabar_id}"""
+        return dict(zip(self.pairs[0::2], self.pairs[1::2]))
+
+    def __len__(self):
+        return len(self.pairs) // 2
+
+    def __repr__(self):
+        reply = f", reply_to={self.reply_to}" if self.is_reply else ""
+        return f"MappingRecord({self.targets()}, t={self.timestamp}{reply})"
+
+    def with_target(self, chat_id, message_id):
+        targets = self.targets()
+        targets[int(chat_id)] = int(message_id)
+        return MappingRecord(targets, self.timestamp, self.reply_to, self.fingerprint)
+
+    def with_fingerprint(self, fingerprint):
+        return MappingRecord(zip(self.pairs[0::2], self.pairs[1::2]), self.timestamp, self.reply_to, fingerprint)
+
+    def with_timestamp(self, timestamp):
+        return MappingRecord(zip(self.pairs[0::2], self.pairs[1::2]), timestamp, self.reply_to, self.fingerprint)
+
+    def to_json(self):
+        """Diskdagi siqilgan format: {"c": {kanal: xabar}, "t": vaqt, "r": ota, "f": fingerprint}"""
+        copies = {str(chat_id): message_id for chat_id, message_id in self.targets().items()}
+        data = {"c": copies, "t": self.timestamp}
+        if self.reply_to is not None:
+            data["r"] = self.reply_to
+        if self.fingerprint:
+            data["f"] = self.fingerprint
+        return data
+
+    @classmethod
+    def from_json(cls, data):
+        """Diskdagi istalgan formatdan yozuv (siqilgan c/t/r/f yoki eski reply_to/targets/_timestamp)
+
+        Noto'g'ri yozuv uchun None.
+        """
+        if not isinstance(data, dict):
+            return None
+        try:
+            if "c" in data and "t" in data:
+                return cls(data["c"], data["t"], data.get("r"), data.get("f"))
+            if "reply_to" in data:
+                return cls(data.get("targets", {}), data.get("_timestamp"), data["reply_to"], data.get("_fp"))
+            targets = {k: v for k, v in data.items() if k not in LEGACY_SERVICE_KEYS}
+            return cls(targets, data.get("_timestamp"), None, data.get("_fp"))
+        except (TypeError, ValueError):
+            return None
+
+
+def is_compact(data):
+    """Yozuv joriy siqilgan formatdami (aks holda - bir martalik ko'chirish kerak)"""
+    return isinstance(data, dict) and "c" in data and "t" in data
+
+
+def load_records(raw):
+    """JSON lug'atdan {int manba_id: MappingRecord} - (yozuvlar, eski formatdagilar soni)"""
+    records = {}
+    legacy = 0
+    for key, value in raw.items():
+        record = MappingRecord.from_json(value)
+        try:
+            source_id = int(key)
+        except ValueError:
+            record = None
+        if record is None:
+            logging.warning(f"⚠️ Noto'g'ri mapping yozuvi o'tkazib yuborildi: {key}")
+            legacy += 1
+            continue
+        if not is_compact(value):
+            legacy += 1
+        records[source_id] = record
+    return records, legacy
+
+
+def read_mapping_file(path):
+    """mapping.json (yoki .backup) ni o'qish - (yozuvlar, eski formatdagilar soni)"""
+    for file_path in (path, f"{path}.backup"):
+        try:
+            with open(file_path, "r", encoding="utf-8") as f:
+                raw = json.load(f)
+            return load_records(raw)
+        except FileNotFoundError:
+            continue
+        except json.JSONDecodeError:
+            logging.error(f"❌ JSON fayl buzilgan: {file_path}")
+            continue
+    return {}, 0
+
+
+def journal_line(record):
+    """Journal qatori: "crc32 JSON" - yarim yozilgan yoki buzilgan qatorni aniqlash uchun"""
+    payload = json.dumps(record, ensure_ascii=False, separators=(',', ':'))
+    return f"{zlib.crc32(payload.encode('utf-8')):08x} {payload}\n"
+
+
+def parse_journal_line(line):
+    """Journal qatorini tekshirib o'qish - buzilgan bo'lsa None"""
+    line = line.rstrip("\n")
+    try:
+        if line.startswith("{"):
+            return json.loads(line)  # Eski format (checksum siz)
+        checksum, _, payload = line.partition(" ")
+        if int(checksum, 16) != zlib.crc32(payload.encode("utf-8")):
+            return None
+        return json.loads(payload)
+    except ValueError:
+        return None
+
+
+def atomic_replace(temp_file, path, fsync=False):
+    """Tayyor temp faylni asosiy fayl o'rniga qo'yish
+
+    Eski fayl nusxalanmaydi - `.backup` ga qayta nomlanadi (O(1)).
+    """
+    if fsync:
+        with open(temp_file, "rb") as f:
+            os.fsync(f.fileno())
+    if os.path.exists(path):
+        os.replace(path, f"{path}.backup")
+    os.replace(temp_file, path)
+
+
+def files_size(paths):
+    """Mavjud fayllar umumiy hajmi (bayt) - yo'qlari hisobga olinmaydi"""
+    total = 0
+    for path in paths:
+        try:
+            total += os.path.getsize(path)
+        except OSError:
+            pass
+    return total
+
+
+def replay_journal(journal_path, data, repair=False):
+    """Journal yozuvlarini lug'atga qo'llash - qo'llangan yozuvlar soni
+
+    `repair=True` - fayl keyin "a" rejimida ochiladigan bo'lsa: oxiridagi yarim
+    yozilgan qator kesib tashlanadi, aks holda keyingi yozuv unga qo'shilib
+    ketadi va qayta yuklashda CRC dan o'tmaydi.
+    """
+    count = 0
+    size = valid_end = 0   # Fayl hajmi va oxirgi to'g'ri qator oxiri (bayt)
+    terminated = True      # Oxirgi to'g'ri qator "\n" bilan tugaganmi
+    try:
+        with open(journal_path, "rb") as f:
+            for raw in f:
+                size += len(raw)
+                record = parse_journal_line(raw.decode("utf-8", "replace"))
+                if record is None:
+                    # Oxirgi qator yarim yozilgan bo'lishi mumkin
+                    logging.warning("⚠️ Journal da buzilgan qator o'tkazib yuborildi")
+                    continue
+                valid_end = size
+                terminated = raw.endswith(b"\n")
+                try:
+                    if record.get("op") == "put":
+                        entry = MappingRecord.from_json(record["v"])
+                        if entry is not None:
+                            data[int(record["k"])] = entry
+                    elif record.get("op") == "del":
+                        keys = record["k"] if isinstance(record["k"], list) else [record["k"]]
+                        for key in keys:
+                            data.pop(int(key), None)
+                except (KeyError, ValueError):
+                    logging.warning("⚠️ Journal da noto'g'ri yozuv o'tkazib yuborildi")
+                    continue
+                count += 1
+    except FileNotFoundError:
+        return count
+    if repair and valid_end < size:
+        os.truncate(journal_path, valid_end)
+        logging.warning(f"✂️ Journal oxiridagi yarim qator kesildi: {journal_path} ({size - valid_end} bayt)")
+    elif repair and not terminated:
+        with open(journal_path, "a", encoding="utf-8") as f:
+            f.write("\n")
+    return count
+
+
+class _KeyLock:
+    __slots__ = ("lock", "owner", "waiters")
+
+    def __init__(self):
+        self.lock = asyncio.Lock()
+        self.owner = None   # Qulfni ushlab turgan vazifa (task)
+        self.waiters = 0
+
+
+class KeyLocks:
+    """Manba post bo'yicha qulflar - bitta post ustidagi o'qish-o'zgartirish-yozish uchun
+
+    Turli postlar bir-birini kutmaydi. Qulf o'z vazifasi (task) ichida qayta
+    kirishli: qulf ostida put/add_target chaqirilsa, u kutib qolmaydi. Bir
+    nechta kalit tartib bilan olinadi (deadlock bo'lmasligi uchun),
+    ishlatilmay qolgan qulflar o'chiriladi.
+    """
+
+    def __init__(self):
+        self._locks = {}  # {kalit: _KeyLock}
+
+    def __len__(self):
+        return len(self._locks)
+
+    @contextlib.asynccontextmanager
+    async def hold(self, *keys):
+        task = asyncio.current_task()
+        acquired = []
+        try:
+            for key in sorted(set(keys)):
+                state = self._locks.get(key)
+                if state is not None and state.owner is task:
+                    continue  # Shu vazifa allaqachon ushlab turibdi
+                if state is None:
+                    state = self._locks[key] = _KeyLock()
+                state.waiters += 1
+                try:
+                    await state.lock.acquire()
+                except BaseException:
+                    state.waiters -= 1
+                    self._discard_idle(key, state)
+                    raise
+                state.waiters -= 1
+                state.owner = task
+                acquired.append((key, state))
+            yield
+        finally:
+            for key, state in reversed(acquired):
+                state.owner = None
+                state.lock.release()
+                self._discard_idle(key, state)
+
+    def _discard_idle(self, key, state):
+        if not state.waiters and not state.lock.locked() and self._locks.get(key) is state:
+            del self._locks[key]
+
+
+class MappingStore:
+    """Xotirada turadigan mapping - o'zgarishlar append-only journal ga yoziladi
+
+    Har bir post/reply/o'chirish journal faylga bitta qator qo'shadi (O(1)).
+    Journal `snapshot_every` ta yozuvdan oshganda to'liq snapshot yoziladi
+    va journal tozalanadi. Reply'lar uchun ota → bolalar indeksi va
+    nusxa (kanal, xabar) → manba post teskari indeksi xotirada yuritiladi,
+    shuning uchun mapping hech qachon to'liq skan qilinmaydi. Yozuvlar kun
+    bo'yicha savatlarga ham bo'linadi - eskirish faqat eski savatlarni oladi.
+
+    Fayl bilan ishlash (journal, snapshot) bitta "writer" thread da navbat
+    bilan bajariladi - event loop faqat tayyor qator yoki lug'at nusxasini
+    uzatadi. Yozuvlar (MappingRecord) o'zgarmas, kalitlar - int manba ID.
+    O'qish qulf kutmaydi; bitta yozuvni o'zgartirish faqat shu post qulfini
+    (`locked`) oladi, umumiy qulf faqat yuklash va snapshot uchun
+    (partitioned backend da - partition o'chiradigan eskirish uchun ham).
+    `commit_window` ichida kelgan barcha o'zgarishlar bitta yozish bilan
+    diskka tushadi (group commit); put/delete shu yozish tugashini kutadi.
+    `durability` - memory, batched yoki fsync (DURABILITY_LEVELS).
+    """
+
+    def __init__(self, path=MAPPING_FILE, snapshot_every=1000, commit_window=0.05, durability=BATCHED):
+        self.path = path
+        self.journal_path = f"{path}.journal"
+        self.snapshot_every = snapshot_every
+        self.commit_window = commit_window
+        self.durability = durability
+        self._data = {}
+        self._journal = None
+        self._journal_records = 0
+        self._batch = []           # Hali diskka yozilmagan journal qatorlari
+        self._commit_task = None   # Joriy batch ni yozadigan vazifa
+        self._children = {}  # {ota_id: {reply_id, ...}}
+        self._sources = {}   # {(kanal_id, xabar_id): manba_id}
+        self._buckets = {}   # {kun: {manba_id, ...}}, None - muddatsiz (eski format)
+        self._lock = asyncio.Lock()  # Yuklash, snapshot va eskirish
+        self._key_locks = KeyLocks()
+        self._writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="mapping-writer")
+
+    def _run(self, func, *args):
+        """Writer thread navbatiga qo'yish - navbat tartibi chaqiruv paytida belgilanadi"""
+        return asyncio.get_running_loop().run_in_executor(self._writer, func, *args)
+
+    def __len__(self):
+        return len(self._data)
+
+    def locked(self, *source_ids):
+        """Postlar qulfi: `async with store.locked(post_id): ...` - shu postlar ustidagi
+        o'qish → Bot API → yozish ketma-ketligini boshqa vazifalardan himoyalash"""
+        return self._key_locks.hold(*map(int, source_ids))
+
+    # Yuklash
+    async def load(self):
+        """Snapshot + journal dan mapping ni xotiraga yuklash"""
+        async with self._lock:
+            replayed, legacy = await self._run(self._load_files)
+            logging.info(f"💾 Mapping yuklandi: {len(self)} ta yozuv ({replayed} ta journal yozuvi)")
+        if legacy:
+            # Bir martalik ko'chirish - eski formatdagi fayl siqilgan formatda qayta yoziladi
+            logging.info(f"🔄 Eski formatdagi {legacy} ta yozuv yangi formatga o'tkazildi")
+            await self.snapshot()
+        return len(self)
+
+    def _load_files(self):
+        # Writer thread - faqat ishga tushishda
+        self._data, legacy = read_mapping_file(self.path)
+        replayed = replay_journal(self.journal_path, self._data, repair=True)
+        self._journal_records = replayed
+        self._rebuild_indexes()
+        self._journal = open(self.journal_path, "a", encoding="utf-8")
+        return replayed, legacy
+
+    # O'qish
+    async def get(self, source_id):
+        """Bitta yozuvni olish - MappingRecord (yo'q bo'lsa None)"""
+        return self._lookup(int(source_id))
+
+    def _lookup(self, key):
+        return self._data.get(key)
+
+    async def count(self):
+        return len(self)
+
+    async def disk_size(self):
+        """Diskdagi mapping hajmi (bayt) - snapshot + journal"""
+        return await self._run(self._disk_size)
+
+    def _disk_size(self):
+        return files_size((self.path, self.journal_path))
+
+    async def thread(self, source_id):
+        """Post va uning barcha javoblari (ichma-ich ham) kalitlari - post birinchi"""
+        root = int(source_id)
+        keys = [root]
+        seen = {root}
+        for key in keys:  # BFS - ro'yxat yurish davomida kengayadi
+            for child in self._child_ids(key):
+                if child not in seen:
+                    seen.add(child)
+                    keys.append(child)
+        return keys
+
+    async def find_source(self, chat_id, message_id):
+        """Nusxadan manba post kalitini topish (topilmasa None)"""
+        return self._sources.get((int(chat_id), int(message_id)))
+
+    def _child_ids(self, key):
+        return self._children.get(key, ())
+
+    # Thread, teskari va kunlik indekslar
+    def _rebuild_indexes(self):
+        self._children = {}
+        self._sources = {}
+        self._buckets = {}
+        for key, entry in self._data.items():
+            self._index(key, entry)
+
+    @staticmethod
+    def _entry_day(key, entry):
+        """Yozuv savati - timestamp kuni (timestamp yo'q eski yozuvlar uchun taxmin)"""
+        if entry.timestamp:
+            return entry.timestamp // DAY
+        # Eski format - kichik Telegram message ID lar eski deb hisoblanadi
+        return 0 if key < 1000000 else None
+
+    def _index(self, key, entry):
+        self._buckets.setdefault(self._entry_day(key, entry), set()).add(key)
+        pairs = entry.pairs
+        for i in range(0, len(pairs), 2):
+            self._sources[(pairs[i], pairs[i + 1])] = key
+        if entry.reply_to is not None:
+            self._children.setdefault(entry.reply_to, set()).add(key)
+
+    def _unindex(self, key, entry):
+        if entry is None:
+            return
+        day = self._entry_day(key, entry)
+        bucket = self._buckets.get(day)
+        if bucket is not None:
+            bucket.discard(key)
+            if not bucket:
+                del self._buckets[day]
+        pairs = entry.pairs
+        for i in range(0, len(pairs), 2):
+            if self._sources.get((pairs[i], pairs[i + 1])) == key:
+                del self._sources[(pairs[i], pairs[i + 1])]
+        if entry.reply_to is not None:
+            parent = entry.reply_to
+            children = self._children.get(parent)
+            if children is not None:
+                children.discard(key)
+                if not children:
+                    del self._children[parent]
+
+    def _set(self, key, entry):
+        self._unindex(key, self._data.get(key))
+        self._data[key] = entry
+        self._index(key, entry)
+
+    def _pop(self, key):
+        entry = self._data.pop(key, None)
+        self._unindex(key, entry)
+        return entry
+
+    # Yozish
+    async def put(self, source_id, entry):
+        """Yozuvni (MappingRecord) qo'shish/yangilash - journal ga bitta qator"""
+        if not isinstance(entry, MappingRecord):
+            entry = MappingRecord.from_json(entry)
+        if not entry.timestamp:
+            entry = entry.with_timestamp(int(time.time()))
+        key = int(source_id)
+        async with self.locked(key):
+            self._set(key, entry)
+            commit = self._write_journal({"op": "put", "k": key, "v": entry.to_json()})
+        await self._committed(commit)
+
+    async def add_target(self, source_id, chat_id, message_id, reply_to=None):
+        """Yozuvga bitta nusxa qo'shish (masalan, qayta urinishda yuborilgandan keyin)"""
+        key = int(source_id)
+        async with self.locked(key):
+            entry = self._lookup(key)
+            if entry is None:
+                entry = MappingRecord({chat_id: message_id}, int(time.time()), reply_to)
+            else:
+                entry = entry.with_target(chat_id, message_id)
+            self._set(key, entry)
+            commit = self._write_journal({"op": "put", "k": key, "v": entry.to_json()})
+        await self._committed(commit)
+
+    async def set_fingerprint(self, source_id, fingerprint):
+        """Manba post fingerprint ini yangilash (edit dan keyin)"""
+        key = int(source_id)
+        async with self.locked(key):
+            entry = self._lookup(key)
+            if entry is None:
+                return
+            entry = entry.with_fingerprint(fingerprint)
+            self._set(key, entry)
+            commit = self._write_journal({"op": "put", "k": key, "v": entry.to_json()})
+        await self._committed(commit)
+
+    async def delete(self, source_id):
+        """Yozuvni o'chirish - mavjud bo'lsa True"""
+        return await self.delete_many([source_id]) > 0
+
+    async def delete_many(self, source_ids):
+        """Bir nechta yozuvni bitta journal yozuvi bilan o'chirish - o'chirilganlar soni
+
+        Post qulflarini kutmaydi - kerak bo'lsa chaqiruvchi `locked` ostida chaqiradi.
+        """
+        removed = [
+            key for key in map(int, source_ids)
+            if self._pop(key) is not None
+        ]
+        if removed:
+            await self._committed(self._write_journal({"op": "del", "k": removed}))
+        return len(removed)
+
+    async def expire(self, cutoff_time):
+        """cutoff_time dan eski yozuvlarni o'chirish - faqat eski kun savatlari ko'riladi"""
+        cutoff_day = cutoff_time // DAY
+        old_entries = []
+        for day in [d for d in self._buckets if d is not None and d <= cutoff_day]:
+            if day < cutoff_day:
+                # Butun savat eskirgan
+                old_entries.extend(self._buckets[day])
+            else:
+                # Chegara kuni - har bir yozuvni tekshirish
+                old_entries.extend(
+                    key for key in self._buckets[day]
+                    if self._data[key].timestamp < cutoff_time
+                )
+        return await self.delete_many(old_entries)
+
+    # Group commit
+    def _write_journal(self, record):
+        """Journal qatorini joriy batch ga qo'shish - batch yoziladigan vazifani qaytaradi"""
+        return self._enqueue(journal_line(record))
+
+    def _enqueue(self, item):
+        self._journal_records += 1
+        if self.durability == MEMORY:
+            return None  # Journal yo'q - keyingi snapshot gacha faqat xotirada
+        self._batch.append(item)
+        if self._commit_task is None:
+            self._commit_task = asyncio.create_task(self._group_commit())
+            self._commit_task.add_done_callback(self._log_write_error)
+        return self._commit_task
+
+    async def _group_commit(self):
+        await asyncio.sleep(self.commit_window)
+        batch, self._batch = self._batch, []
+        self._commit_task = None
+        await self._run(self._write_batch, batch)
+
+    async def _committed(self, commit):
+        """O'zgarish diskka yozilishini kutish (chaqiruvchi bekor qilinsa ham batch yoziladi)"""
+        if commit is not None:
+            await asyncio.shield(commit)
+        await self._maybe_snapshot()
+
+    async def flush(self):
+        """Navbatdagi batch ni darhol yozib tugatish"""
+        if self._commit_task is not None:
+            await asyncio.shield(self._commit_task)
+
+    def _write_batch(self, batch):
+        # Writer thread - butun batch bitta write bilan
+        if self._journal is None:
+            self._journal = open(self.journal_path, "a", encoding="utf-8")
+        self._journal.write("".join(batch))
+        self._sync(self._journal)
+
+    def _sync(self, f):
+        # Writer thread - darajaga qarab OS ga yoki diskka
+        f.flush()
+        if self.durability == FSYNC:
+            os.fsync(f.fileno())
+
+    @staticmethod
+    def _log_write_error(future):
+        if not future.cancelled() and future.exception() is not None:
+            logging.error(f"❌ Mapping journal yozishda xato: {future.exception()}")
+
+    # Snapshot
+    async def _maybe_snapshot(self):
+        if self._journal_records >= self.snapshot_every:
+            await self.snapshot()
+
+    async def snapshot(self):
+        """To'liq mapping ni faylga yozish va journal ni tozalash (writer thread da)"""
+        async with self._lock:
+            # Sayoz nusxa yetarli - yozuvlar o'zgarmas
+            data = dict(self._data)
+            self._journal_records = 0
+            # Shu paytgacha navbatdagi journal qatorlari snapshot dan oldin yoziladi,
+            # keyingilari esa yangi journal ga tushadi
+            pending = self._run(self._write_snapshot, data)
+        try:
+            elapsed = await pending
+            logging.info(f"💾 Mapping snapshot yozildi: {len(data)} ta yozuv ({elapsed:.2f} s, fonda)")
+        except Exception as e:
+            logging.error(f"❌ Mapping snapshot yozishda xato: {e}")
+
+    def _write_snapshot(self, data):
+        # Writer thread
+        start = time.monotonic()
+
+        # Atomic write - temp fayl orqali, eski snapshot .backup bo'lib qoladi
+        temp_file = f"{self.path}.tmp"
+        compressed = {str(k): v.to_json() for k, v in data.items()}
+        with open(temp_file, "w", encoding="utf-8") as f:
+            json.dump(compressed, f, ensure_ascii=False, separators=(',', ':'))  # Compact JSON
+        atomic_replace(temp_file, self.path, fsync=self.durability == FSYNC)
+
+        # Journal endi snapshot ichida - tozalash
+        if self._journal is not None:
+            self._journal.close()
+        self._journal = open(self.journal_path, "w", encoding="utf-8")
+        return time.monotonic() - start
+
+    async def close(self):
+        """Bot to'xtaganda - oxirgi snapshot va journal ni yopish"""
+        await self.flush()
+        await self.snapshot()
+        await self._run(self._close_files)
+        self._writer.shutdown(wait=True)
+
+    def _close_files(self):
+        # Writer thread
+        if self._journal is not None:
+            self._journal.close()
+            self._journal = None
+
+
+def create_mapping_store(backend="json", path=MAPPING_FILE, db_path="mapping.db",
+                         partition_dir="mapping.d", binary_path="mapping.bin", snapshot_every=1000,
+                         commit_window=0.05, durability=BATCHED):
+    """Sozlamaga qarab mapping backend ni yaratish (json, partitioned, sqlite yoki binary)"""
+    if durability not in DURABILITY_LEVELS:
+        logging.warning(f"⚠️ Noma'lum MAPPING_DURABILITY: {durability}, {BATCHED} ishlatiladi")
+        durability = BATCHED
+    if backend == "sqlite":
+        from mapping_sqlite import SqliteMappingStore
+        return SqliteMappingStore(db_path, legacy_path=path, durability=durability)
+    if backend == "partitioned":
+        from mapping_partitioned import PartitionedMappingStore
+        return PartitionedMappingStore(partition_dir, legacy_path=path, snapshot_every=snapshot_every,
+                                       commit_window=commit_window, durability=durability)
+    if backend == "binary":
+        from mapping_binary import BinaryMappingStore
+        return BinaryMappingStore(binary_path, legacy_path=path, snapshot_every=snapshot_every,
+                                  commit_window=commit_window, durability=durability)
+    if backend != "json":
+        logging.warning(f"⚠️ Noma'lum MAPPING_BACKEND: {backend}, json ishlatiladi")
+    return MappingStore(path, snapshot_every=snapshot_every, commit_window=commit_window, durability=durability)
@@ -0,0 +1,52 @@
+class RoutingTable:
+    """(model, viloyat) → tayyor nishon kanallar kortej jadvali
+
+    Admin config o'zgarganda bir marta quriladi; post uchun nishonlarni
+    topish - bitta lug'at qidiruvi. Model/viloyat aniqlanmagan yoki kanali
+    yo'q bo'lsa, kalit sifatida None ishlatiladi.
+    Tartib: umumiy kanallar, keyin model, keyin viloyat kanallari (takrorsiz).
+    """
+
+    def __init__(self, config, version=None):
+        self.version = version
+        always = config.get("always_send_to", [])
+        model_channels = config.get("model_channels", {})
+        region_channels = config.get("region_channels", {})
+
+        models = [None] + list(model_channels)
+        regions = [None] + list(region_channels)
+        self._table = {}
+        for model in models:
+            for region in regions:
+                channels = list(always)
+                if model is not None:
+                    channels += model_channels[model]
+                if region is not None:
+                    channels += region_channels[region]
+                self._table[(model, region)] = tuple(dict.fromkeys(channels))
+
+    def has_model(self, model):
+        return (model, None) in self._table
+
+    def has_region(self, region):
+        return (None, region) in self._table
+
+    def targets(self, model, region):
+        """Post uchun nishon kanallar korteji"""
+        if model is not None and (model, None) not in self._table:
+            model = None
+        if region is not None and (None, region) not in self._table:
+            region = None
+        return self._table[(model, region)]
+
+    def __len__(self):
+        return len(self._table)
+
+    def dump(self, channel_names=None):
+        """Jadvalni matn ko'rinishida (adminlar uchun)"""
+        channel_names = channel_names or {}
+        lines = []
+        for (model, region), channels in self._table.items():
+            names = ", ".join(channel_names.get(str(ch), str(ch)) for ch in channels) or "—"
+            lines.append(f"{model or '—'} + {region or '—'} → {len(channels)} ta: {names}")
+        return lines
@@ -0,0 +1,278 @@
+import heapq
+import itertools
+import logging
+import time
+import asyncio
+
+from aiogram.exceptions import (
+    TelegramRetryAfter,
+    TelegramNetworkError,
+    TelegramServerError
+)
+
+# Xato turlari
+RETRY_AFTER = "retry_after"  # Telegram aytgan vaqtdan keyin qayta urinish
+TRANSIENT = "transient"      # Tarmoq/server xatosi - backoff bilan qayta urinish
+PERMANENT = "permanent"      # Forbidden, not found, bad request - qayta urinmaslik
+
+
+class TokenBucket:
+    """Oddiy token bucket - sekundiga `rate` ta, ko'pi bilan `capacity` ta zaxira"""
+
+    __slots__ = ("rate", "capacity", "tokens", "updated")
+
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+
+    def refill(self, now):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self):
+        """Bitta token uchun kutish vaqti (sekund)"""
+        return 0.0 if self.tokens >= 1 else (1 - self.tokens) / self.rate
+
+
+class RateLimiter:
+    """Telegram Bot API uchun umumiy + har bir chat uchun alohida limit
+
+    Barcha chiquvchi so'rovlar (copy, edit, delete) shu limiter orqali o'tadi,
+    shuning uchun parallel tarqatishda ham 429 (flood) xatosiga tushmaymiz.
+    """
+
+    def __init__(self, global_rate=30, per_chat_rate=1, per_chat_burst=3):
+        self.global_bucket = TokenBucket(global_rate, max(1, global_rate))
+        self.per_chat_rate = per_chat_rate
+        self.per_chat_burst = max(1, per_chat_burst)
+        self._chats = {}
+
+    def _chat_bucket(self, chat_id):
+        bucket = self._chats.get(chat_id)
+        if bucket is None:
+            if len(self._chats) > 1000:
+                self._prune()
+            bucket = self._chats[chat_id] = TokenBucket(self.per_chat_rate, self.per_chat_burst)
+        return bucket
+
+    def _prune(self):
+        # To'lgan (uzoq vaqt ishlatilmagan) bucket larni tashlab yuborish
+        now = time.monotonic()
+        for chat_id, bucket in list(self._chats.items()):
+            bucket.refill(now)
+            if bucket.tokens >= bucket.capacity:
+                del self._chats[chat_id]
+
+    def pause(self, chat_id, seconds):
+        """RetryAfter dan keyin chatni (chat noma'lum bo'lsa - butun botni) `seconds` ga to'xtatish"""
+        if chat_id is None:
+            bucket, rate = self.global_bucket, self.global_bucket.rate
+        else:
+            bucket, rate = self._chat_bucket(chat_id), self.per_chat_rate
+        bucket.refill(time.monotonic())
+        bucket.tokens = min(bucket.tokens, 1 - seconds * rate)
+
+    async def acquire(self, chat_id):
+        """Ikkala limit ham ruxsat berguncha kutish"""
+        chat_bucket = self._chat_bucket(chat_id)
+        while True:
+            now = time.monotonic()
+            self.global_bucket.refill(now)
+            chat_bucket.refill(now)
+            delay = max(self.global_bucket.wait_time(), chat_bucket.wait_time())
+            if delay <= 0:
+                self.global_bucket.tokens -= 1
+                chat_bucket.tokens -= 1
+                return
+            await asyncio.sleep(delay)
+
+    async def call(self, method, **kwargs):
+        """Bot API metodini limit bilan chaqirish: call(bot.copy_message, chat_id=..., ...)"""
+        await self.acquire(kwargs.get("chat_id"))
+        return await method(**kwargs)
+
+
+class FanOutResult:
+    """Fan-out natijasi - muvaffaqiyatli va xato bo'lgan nishonlar"""
+
+    def __init__(self, ok, failed, elapsed):
+        self.ok = ok              # {target: natija}
+        self.failed = failed      # {target: Exception}
+        self.elapsed = elapsed    # umumiy vaqt (sekund)
+
+    def __repr__(self):
+        return f"FanOutResult(ok={len(self.ok)}, failed={len(self.failed)}, elapsed={self.elapsed:.3f}s)"
+
+
+async def fan_out(targets, send_one, concurrency=8):
+    """Barcha nishonlarga parallel yuborish - bir vaqtda ko'pi bilan `concurrency` ta so'rov
+
+    `send_one(target)` har bir nishon uchun chaqiriladi; xatolar to'xtatmaydi,
+    balki natijadagi `failed` ga yig'iladi.
+    """
+    semaphore = asyncio.Semaphore(max(1, concurrency))
+    start = time.monotonic()
+
+    async def run(target):
+        async with semaphore:
+            try:
+                return target, await send_one(target), None
+            except Exception as e:
+                return target, None, e
+
+    ok, failed = {}, {}
+    for target, value, error in await asyncio.gather(*(run(t) for t in targets)):
+        if error is None:
+            ok[target] = value
+        else:
+            failed[target] = error
+
+    result = FanOutResult(ok, failed, time.monotonic() - start)
+    logging.debug(f"⏱ Fan-out: {result}")
+    return result
+
+
+def classify_error(error):
+    """Xatoni turkumlash - (tur, server aytgan kutish vaqti yoki None)"""
+    if isinstance(error, TelegramRetryAfter):
+        return RETRY_AFTER, error.retry_after
+    if isinstance(error, (TelegramNetworkError, TelegramServerError, asyncio.TimeoutError, ConnectionError)):
+        return TRANSIENT, None
+    return PERMANENT, None
+
+
+class RetryJob:
+    __slots__ = ("description", "operation", "on_success", "attempt", "key", "chat_id", "seq")
+
+    def __init__(self, description, operation, on_success, attempt, key, chat_id, seq):
+        self.description = description
+        self.operation = operation
+        self.on_success = on_success
+        self.attempt = attempt
+        self.key = key
+        self.chat_id = chat_id
+        self.seq = seq
+
+
+class RetryScheduler:
+    """Muvaffaqiyatsiz Bot API so'rovlarini fonda qayta urinish navbati
+
+    Asosiy oqim (post/reply/edit/delete) kutmaydi - xato navbatga qo'yiladi,
+    fon vazifasi uni belgilangan vaqtda qayta bajaradi. Bir xil `key` bilan
+    yangi ish qo'yilsa yoki `cancel(key)` chaqirilsa, eskisi bekor bo'ladi
+    (masalan, nusxa keyingi edit bilan to'g'ridan-to'g'ri yangilanganda).
+    """
+
+    def __init__(self, max_attempts=5, base_delay=2, max_delay=300, limiter=None):
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.limiter = limiter
+        self._queue = []
+        self._seq = itertools.count()
+        self._latest = {}
+        self._running = {}  # {key: bajarilayotgan ish vazifasi}
+        self._wakeup = asyncio.Event()
+        self._worker = None
+
+    def __len__(self):
+        return len(self._queue)
+
+    def cancel(self, key):
+        """`key` bo'yicha kutilayotgan ishni o'chirish, bajarilayotganini (limiter
+        navbatida yoki so'rov kutayotgan) to'xtatish"""
+        if self._latest.pop(key, None) is not None:
+            logging.info(f"⏹ Qayta urinish bekor qilindi: {key}")
+        self._stop_running(key)
+
+    def _stop_running(self, key):
+        task = self._running.pop(key, None)
+        if task is not None and task is not asyncio.current_task():
+            task.cancel()
+
+    def _finish_running(self, job):
+        if job.key is not None and self._running.get(job.key) is asyncio.current_task():
+            del self._running[job.key]
+
+    def _is_stale(self, job):
+        return job.key is not None and self._latest.get(job.key) != job.seq
+
+    def schedule(self, description, operation, error, on_success=None, attempt=1, key=None, chat_id=None):
+        """Xatoga qarab qayta urinishni navbatga qo'yish - qo'yilgan bo'lsa True
+
+        `operation()` - qayta bajariladigan coroutine funksiya,
+        `on_success(natija)` - muvaffaqiyatdan keyin chaqiriladi (masalan, mapping yangilash).
+        """
+        kind, retry_after = classify_error(error)
+        if kind == PERMANENT:
+            logging.error(f"❌ {description}: doimiy xato, qayta urinilmaydi ({error})")
+            return False
+        if attempt > self.max_attempts:
+            logging.error(f"❌ {description}: {self.max_attempts} ta urinishdan keyin ham xato ({error})")
+            return False
+
+        if kind == RETRY_AFTER:
+            delay = retry_after + 0.5
+            if self.limiter is not None:
+                self.limiter.pause(chat_id, retry_after)
+        else:
+            delay = min(self.max_delay, self.base_delay * 2 ** (attempt - 1))
+
+        seq = next(self._seq)
+        if key is not None:
+            self._latest[key] = seq
+            self._stop_running(key)  # Yangi ish eskisining o'rnini oladi
+        job = RetryJob(description, operation, on_success, attempt, key, chat_id, seq)
+        heapq.heappush(self._queue, (time.monotonic() + delay, seq, job))
+        logging.warning(f"🔁 {description}: {delay:.1f} s dan keyin qayta urinish ({attempt}/{self.max_attempts})")
+
+        if self._worker is None or self._worker.done():
+            self._worker = asyncio.create_task(self._run_worker())
+        self._wakeup.set()
+        return True
+
+    async def _run_worker(self):
+        while True:
+            if not self._queue:
+                self._wakeup.clear()
+                await self._wakeup.wait()
+                continue
+            due, seq, job = self._queue[0]
+            delay = due - time.monotonic()
+            if delay > 0:
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), delay)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            heapq.heappop(self._queue)
+            if self._is_stale(job):
+                continue  # Yangiroq ish bilan almashtirilgan yoki bekor qilingan
+            task = asyncio.create_task(self._run_job(job))
+            if job.key is not None:
+                self._running[job.key] = task
+
+    async def _run_job(self, job):
+        try:
+            result = await job.operation()
+        except Exception as e:
+            self._finish_running(job)
+            if self._is_stale(job):
+                return  # Bajarilayotganda bekor qilingan - qayta qo'ymaslik
+            self.schedule(job.description, job.operation, e, job.on_success, job.attempt + 1, job.key, job.chat_id)
+            return
+        except asyncio.CancelledError:
+            logging.info(f"⏹ {job.description}: bajarilayotgan qayta urinish to'xtatildi")
+            raise
+        self._finish_running(job)
+        if job.key is not None and not self._is_stale(job):
+            del self._latest[job.key]
+        logging.info(f"✅ {job.description}: qayta urinishda muvaffaqiyatli")
+        if job.on_success is not None:
+            try:
+                await job.on_success(result)
+            except Exception as e:
+                logging.error(f"❌ {job.description}: natijani saqlashda xato: {e}")
@@ -0,0 +1,146 @@
+import asyncio
+import os
+import sys
+import tempfile
+import time
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), os.pardir))
+
+from mapping_store import MappingRecord, create_mapping_store  # noqa: E402
+
+TORN_TAIL = '1234abcd {"op":"put","k":7000001,"v":{"c":{"-1'
+
+
+async def crash(store):
+    """Bot yiqilishi - snapshot siz, faqat yozilgan journal qoladi"""
+    await store.flush()
+    await store._run(store._close_files)
+    store._writer.shutdown(wait=True)
+
+
+class TornJournalTailTest(unittest.TestCase):
+    """Yarim yozilgan oxirgi qatordan keyingi yozuvlar qayta yuklashda yo'qolmasligi"""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+
+    def make_store(self, backend):
+        tmp = os.path.join(self.tmp.name, backend)
+        os.makedirs(tmp, exist_ok=True)
+        return create_mapping_store(
+            backend,
+            path=os.path.join(tmp, "mapping.json"),
+            partition_dir=os.path.join(tmp, "mapping.d"),
+            binary_path=os.path.join(tmp, "mapping.bin"),
+            commit_window=0
+        )
+
+    def journal_files(self, backend):
+        if backend == "partitioned":
+            directory = os.path.join(self.tmp.name, backend, "mapping.d")
+            return [os.path.join(directory, name) for name in os.listdir(directory) if name.endswith(".jsonl")]
+        name = "mapping.bin" if backend == "binary" else "mapping.json"
+        return [os.path.join(self.tmp.name, backend, f"{name}.journal")]
+
+    async def scenario(self, backend):
+        now = int(time.time())
+        store = self.make_store(backend)
+        await store.load()
+        await store.put(8000001, MappingRecord({-1: 1}, now))
+        await crash(store)
+
+        for path in self.journal_files(backend):
+            with open(path, "a", encoding="utf-8") as f:
+                f.write(TORN_TAIL)
+
+        store = self.make_store(backend)
+        await store.load()
+        await store.put(8000003, MappingRecord({-1: 3}, now))
+        await store.put(8000004, MappingRecord({-1: 4}, now))
+        await crash(store)
+
+        store = self.make_store(backend)
+        await store.load()
+        keys = [key for key in (8000001, 7000001, 8000003, 8000004) if await store.get(key) is not None]
+        await store.close()
+        return keys
+
+    def test_writes_after_torn_tail_survive_reload(self):
+        for backend in ("json", "partitioned", "binary"):
+            with self.subTest(backend=backend):
+                self.assertEqual(asyncio.run(self.scenario(backend)), [8000001, 8000003, 8000004])
+
+
+def make_partitioned(directory):
+    legacy_path = os.path.join(os.path.dirname(directory), "mapping.json")
+    return create_mapping_store("partitioned", path=legacy_path, partition_dir=directory, commit_window=0)
+
+
+class PartitionBackupTest(unittest.TestCase):
+    """Backup dan tiklangan partition ga yozilgandan keyin eski yozuvlar qolishi"""
+
+    async def scenario(self, directory):
+        now = int(time.time())
+        store = make_partitioned(directory)
+        await store.load()
+        for key in (8000001, 8000002, 8000003):
+            await store.put(key, MappingRecord({-1: key}, now))
+        await crash(store)
+
+        # Partition ni qayta yozish paytida yiqilish - faqat .backup qolgan
+        for name in os.listdir(directory):
+            os.replace(os.path.join(directory, name), os.path.join(directory, f"{name}.backup"))
+
+        store = make_partitioned(directory)
+        await store.load()
+        await store.put(8000004, MappingRecord({-1: 4}, now))
+        await crash(store)
+
+        store = make_partitioned(directory)
+        count = await store.load()
+        await store.close()
+        return count
+
+    def test_backup_entries_survive_new_writes(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            self.assertEqual(asyncio.run(self.scenario(os.path.join(tmp, "mapping.d"))), 4)
+
+
+class LegacyMigrationTest(unittest.TestCase):
+    """mapping.json faqat bir marta ko'chiriladi - eskirgan yozuvlar qaytib kelmaydi"""
+
+    async def scenario(self, backend, tmp):
+        legacy_path = os.path.join(tmp, "mapping.json")
+        with open(legacy_path, "w", encoding="utf-8") as f:
+            f.write('{"8000001":{"c":{"-1":1},"t":%d}}' % int(time.time()))
+
+        def make_store():
+            return create_mapping_store(
+                backend,
+                path=legacy_path,
+                db_path=os.path.join(tmp, "mapping.db"),
+                partition_dir=os.path.join(tmp, "mapping.d"),
+                commit_window=0
+            )
+
+        store = make_store()
+        migrated = await store.load()
+        # Hammasi eskiradi - partition fayllar ham o'chiriladi
+        await store.expire(int(time.time()) + 2 * 24 * 60 * 60)
+        await store.close()
+
+        store = make_store()
+        reloaded = await store.load()
+        await store.close()
+        return migrated, reloaded
+
+    def test_expired_entries_stay_expired(self):
+        for backend in ("sqlite", "partitioned"):
+            with self.subTest(backend=backend), tempfile.TemporaryDirectory() as tmp:
+                self.assertEqual(asyncio.run(self.scenario(backend, tmp)), (1, 0))
+
+
+if __name__ == "__main__":
+    unittest.main()